@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import BoardCrawlState
+
+
+@admin.register(BoardCrawlState)
+class BoardCrawlStateAdmin(admin.ModelAdmin):
+    list_display = ('board', 'enabled', 'posts_per_hour', 'last_crawled_at', 'next_crawl_at', 'retention_days',
+                    'retention_action')
+    list_editable = ('enabled', 'retention_days', 'retention_action')
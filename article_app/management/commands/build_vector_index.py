@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from env_settings import settings
+from rag_app.vector_stores import get_local_index
+
+
+class Command(BaseCommand):
+    help = '為本機向量索引建立 IVF 近似搜尋索引（vector_backend=local 時使用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--index', action='append', help='索引名稱，預設為 settings.index_profiles 的全部索引')
+        parser.add_argument('--nlist', type=int, help='分群數，預設為向量數的平方根')
+
+    def handle(self, *args, **options):
+        if settings.vector_backend != 'local':
+            raise CommandError('vector_backend 不是 local')
+        index_names = options['index'] or list(dict.fromkeys(profile.index_name for profile in settings.index_profiles))
+        for index_name in index_names:
+            get_local_index(index_name).build_ann_index(nlist=options['nlist'])
+            self.stdout.write(f'{index_name} 已建立 IVF 索引')
@@ -0,0 +1,68 @@
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from article_app.models import ReindexJob
+from celery_app.data_processing import get_index_names
+from celery_app.reindex import (catch_up, create_reindex_job, drop_namespace, reindex_range, reset_db_connections,
+                                swap_namespace)
+from log_app.models import Log
+
+
+class Command(BaseCommand):
+    help = '從資料庫重建向量索引：寫入新的 namespace，完成後切換，中斷後再次執行會從進度繼續'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--index', action='append', help='索引名稱，預設為 settings.index_profiles 的全部索引')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='寫入用的行程數')
+        parser.add_argument('--range-size', type=int, default=5000, help='每個行程一次處理的文章 id 區間大小')
+        parser.add_argument('--restart', action='store_true', help='放棄未完成的重建工作並重新開始')
+        parser.add_argument('--keep-old', action='store_true', help='切換後保留舊 namespace 的向量')
+
+    def handle(self, *args, **options):
+        index_names = options['index'] or get_index_names()
+        unknown = set(index_names) - set(get_index_names())
+        if unknown:
+            raise CommandError(f'未設定的索引: {", ".join(sorted(unknown))}')
+        job = ReindexJob.objects.filter(status='running').order_by('-id').first()
+        if job and (options['restart'] or set(job.index_names) != set(index_names)):
+            job.status = 'abandoned'
+            job.save(update_fields=['status', 'updated_at'])
+            self.stdout.write(f'已放棄重建工作 {job.namespace}')
+            job = None
+        if job is None:
+            job = create_reindex_job(index_names, options['range_size'])
+            self.stdout.write(f'開始重建 {", ".join(index_names)} 至 namespace {job.namespace}')
+        else:
+            self.stdout.write(f'繼續重建 {", ".join(job.index_names)} 至 namespace {job.namespace}')
+        range_ids = list(job.ranges.filter(done=False).order_by('start_id').values_list('id', flat=True))
+        total = job.ranges.count()
+        upserted = failed = 0
+        # fork 前先關閉連線，子行程不會與父行程共用同一條連線
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=reset_db_connections) as executor:
+            futures = {executor.submit(reindex_range, range_id): range_id for range_id in range_ids}
+            for future in as_completed(futures):
+                try:
+                    upserted += future.result()
+                except Exception as e:
+                    failed += 1
+                    Log.objects.create(level='ERROR', type='reindex', message=f'重建區間 {futures[future]} 失敗: {e}',
+                                       traceback=traceback.format_exc())
+                self.stdout.write(f'區間完成 {total - job.ranges.filter(done=False).count()}/{total}')
+        if failed:
+            raise CommandError(f'{failed} 個區間失敗，請重新執行以繼續')
+        upserted += catch_up(job)
+        old_namespaces = swap_namespace(job)
+        # 切換前最後一次補寫後仍可能有文章寫入舊 namespace，切換後再補寫一次
+        upserted += catch_up(job)
+        if not options['keep_old']:
+            for index_name, namespace in old_namespaces.items():
+                if namespace != job.namespace:
+                    drop_namespace(index_name, namespace)
+        Log.objects.create(level='INFO', type='reindex',
+                           message=f'重建完成，{", ".join(job.index_names)} 已切換至 {job.namespace}，共寫入 {upserted} 段')
+        self.stdout.write(f'重建完成，已切換至 {job.namespace}，共寫入 {upserted} 段')
@@ -0,0 +1,111 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from article_app.models import Article, ArticleHtml, UnparsedArticle
+from celery_app.archive import parse_archived_html
+from celery_app.data_processing import store_data_in_pinecone
+from celery_app.scraper import get_author_ids, save_articles
+from log_app.models import Log
+
+
+class Command(BaseCommand):
+    help = '以封存的 HTML 重新解析文章並批次更新資料庫與索引，不需重新爬取'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--board', help='只處理指定看板')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='解析用的行程數')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批處理的文章數')
+
+    def handle(self, *args, **options):
+        articles = Article.objects.filter(raw_html__isnull=False)
+        unparsed_articles = UnparsedArticle.objects.all()
+        if options['board']:
+            articles = articles.filter(board__name=options['board'])
+            unparsed_articles = unparsed_articles.filter(board__name=options['board'])
+        workers = options['workers']
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            updated, failed = self.reparse_articles(executor, workers, articles, options['batch_size'])
+            recovered, unparsed = self.reparse_unparsed_articles(executor, workers, unparsed_articles,
+                                                                 options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'重新解析完成，更新 {updated} 篇，失敗 {failed} 篇；'
+                                             f'先前解析失敗的文章存入 {recovered} 篇，仍失敗 {unparsed} 篇'))
+
+    @staticmethod
+    def parse_rows(executor, workers: int, rows: list) -> dict:
+        """rows 為 [(id, 看板, HTML sha256)]，回傳 {id: (解析結果, 錯誤)}。"""
+        html_data = dict(ArticleHtml.objects.filter(sha256__in={row[2] for row in rows}).values_list('sha256', 'data'))
+        items = [(row_id, board, bytes(html_data[sha256])) for row_id, board, sha256 in rows if sha256 in html_data]
+        chunksize = max(1, len(items) // (workers * 4))
+        results = {}
+        for row_id, article_data, error in executor.map(parse_archived_html, items, chunksize=chunksize):
+            if not error and len(article_data['content']) > 30000:
+                error = '文章內容過長'
+            results[row_id] = (article_data, error)
+        return results
+
+    def reparse_articles(self, executor, workers: int, articles, batch_size: int) -> tuple:
+        last_id = 0
+        updated = failed = 0
+        while True:
+            rows = list(articles.filter(id__gt=last_id).order_by('id')
+                        .values_list('id', 'board__name', 'raw_html_id')[:batch_size])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            parsed = {}
+            for article_id, (article_data, error) in self.parse_rows(executor, workers, rows).items():
+                if error:
+                    failed += 1
+                    Log.objects.create(level='ERROR', type='reparse', message=f'文章 {article_id} 重新解析失敗: {error}')
+                    continue
+                parsed[article_id] = article_data
+            author_ids = get_author_ids({article_data['author'] for article_data in parsed.values()})
+            article_objs = list(Article.objects.filter(id__in=parsed.keys()))
+            for article in article_objs:
+                article_data = parsed[article.id]
+                article.title = article_data['title']
+                article.author_id = author_ids[article_data['author']]
+                article.content = article_data['content']
+                article.post_time = article_data['post_time']
+            Article.objects.bulk_update(article_objs, ['title', 'author', 'content', 'post_time'])
+            # 向量、關鍵字索引與答案快取依新內容更新；段落雜湊未變的文章不會重新嵌入
+            if article_objs:
+                store_data_in_pinecone.delay([article.id for article in article_objs])
+            updated += len(article_objs)
+            self.stdout.write(f'已處理至文章 {last_id}，更新 {updated} 篇，失敗 {failed} 篇')
+        return updated, failed
+
+    def reparse_unparsed_articles(self, executor, workers: int, unparsed_articles, batch_size: int) -> tuple:
+        """重新解析爬取時解析失敗的文章，成功的存入 Article 並寫入索引。"""
+        last_id = 0
+        recovered = failed = 0
+        while True:
+            rows = list(unparsed_articles.filter(id__gt=last_id).order_by('id')
+                        .values_list('id', 'board__name', 'raw_html_id')[:batch_size])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            unparsed = {row.id: row for row in UnparsedArticle.objects.filter(id__in=[row[0] for row in rows])}
+            article_data_list = []
+            errors = []
+            for row_id, (article_data, error) in self.parse_rows(executor, workers, rows).items():
+                if error:
+                    failed += 1
+                    unparsed[row_id].error = error
+                    errors.append(unparsed[row_id])
+                    continue
+                article_data['url'] = unparsed[row_id].url
+                article_data['raw_html_id'] = unparsed[row_id].raw_html_id
+                article_data_list.append(article_data)
+            UnparsedArticle.objects.bulk_update(errors, ['error'])
+            article_id_list = save_articles('reparse', article_data_list)
+            if article_id_list:
+                store_data_in_pinecone.delay(article_id_list)
+            # 已存在於 Article 的網址（包含其他爬蟲先存入的）不再需要重新解析
+            saved_urls = Article.objects.filter(url__in=[data['url'] for data in article_data_list]).values('url')
+            UnparsedArticle.objects.filter(id__in=list(unparsed), url__in=saved_urls).delete()
+            recovered += len(article_id_list)
+            self.stdout.write(f'已處理至解析失敗的文章 {last_id}，存入 {recovered} 篇，仍失敗 {failed} 篇')
+        return recovered, failed
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article_app', '0002_rename_time_article_post_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoardCrawlState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_index_page', models.IntegerField(blank=True, default=None, null=True)),
+                ('last_article_url', models.URLField(blank=True, default=None, max_length=255, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('board', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='crawl_state', to='article_app.board')),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:30
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_urls(apps, schema_editor):
+    Article = apps.get_model('article_app', 'Article')
+    duplicates = Article.objects.values('url').annotate(min_id=Min('id'), url_count=Count('id')).filter(url_count__gt=1)
+    for duplicate in duplicates:
+        Article.objects.filter(url=duplicate['url']).exclude(id=duplicate['min_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article_app', '0003_boardcrawlstate'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_urls, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='article',
+            name='url',
+            field=models.URLField(max_length=255, unique=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:26
+
+from django.db import migrations, models
+
+
+def create_default_boards(apps, schema_editor):
+    Board = apps.get_model('article_app', 'Board')
+    BoardCrawlState = apps.get_model('article_app', 'BoardCrawlState')
+    for name in ['Gossiping', 'NBA', 'Stock', 'LoL', 'home-sale']:
+        board, _ = Board.objects.get_or_create(name=name)
+        BoardCrawlState.objects.get_or_create(board=board)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article_app', '0005_articlehtml'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boardcrawlstate',
+            name='enabled',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='boardcrawlstate',
+            name='last_crawled_at',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='boardcrawlstate',
+            name='max_interval',
+            field=models.IntegerField(default=21600, help_text='最長爬取間隔（秒）'),
+        ),
+        migrations.AddField(
+            model_name='boardcrawlstate',
+            name='min_interval',
+            field=models.IntegerField(default=300, help_text='最短爬取間隔（秒）'),
+        ),
+        migrations.AddField(
+            model_name='boardcrawlstate',
+            name='next_crawl_at',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='boardcrawlstate',
+            name='posts_per_hour',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(create_default_boards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article_app', '0006_boardcrawlstate_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleIndexState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index_name', models.CharField(max_length=100)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('chunk_hashes', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='index_states', to='article_app.article')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='articleindexstate',
+            constraint=models.UniqueConstraint(fields=('article', 'index_name'), name='unique_article_index_state'),
+        ),
+    ]
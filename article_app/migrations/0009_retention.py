@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article_app', '0008_reindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('content', models.TextField()),
+                ('post_time', models.DateTimeField()),
+                ('url', models.URLField(max_length=255, unique=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='boardcrawlstate',
+            name='retention_action',
+            field=models.CharField(choices=[('vectors', '只刪除向量'), ('archive', '刪除向量並封存文章'), ('delete', '刪除向量與文章')], default='vectors', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='boardcrawlstate',
+            name='retention_days',
+            field=models.IntegerField(blank=True, default=None, help_text='保留天數，空白代表永久保留', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['board', 'post_time'], name='article_app_board_i_96af91_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['post_time'], name='article_app_post_ti_c27da9_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedarticle',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='article_app.author'),
+        ),
+        migrations.AddField(
+            model_name='archivedarticle',
+            name='board',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='article_app.board'),
+        ),
+        migrations.AddField(
+            model_name='archivedarticle',
+            name='raw_html',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, to='article_app.articlehtml'),
+        ),
+    ]
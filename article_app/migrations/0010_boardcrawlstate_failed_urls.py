@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article_app', '0009_retention'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boardcrawlstate',
+            name='failed_urls',
+            field=models.JSONField(blank=True, default=dict, help_text='抓取失敗、下次爬取時重試的文章網址與失敗次數'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article_app', '0010_boardcrawlstate_failed_urls'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnparsedArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=255, unique=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='article_app.board')),
+                ('raw_html', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='article_app.articlehtml')),
+            ],
+        ),
+    ]
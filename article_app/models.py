@@ -7,12 +7,74 @@ class Article(models.Model):
     author = models.ForeignKey('Author', on_delete=models.CASCADE)
     content = models.TextField()
     post_time = models.DateTimeField()
-    url = models.URLField(max_length=255)
+    url = models.URLField(max_length=255, unique=True)
+    raw_html = models.ForeignKey('ArticleHtml', null=True, blank=True, default=None, on_delete=models.SET_NULL)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['board', 'post_time']),
+            models.Index(fields=['post_time']),
+        ]
+
+    def __str__(self):
+        return self.url
+
+
+class ArchivedArticle(models.Model):
+    # 超過保留期限而移出 Article 的文章，欄位與 Article 相同
+    board = models.ForeignKey('Board', on_delete=models.CASCADE)
+    title = models.CharField(max_length=255)
+    author = models.ForeignKey('Author', on_delete=models.CASCADE)
+    content = models.TextField()
+    post_time = models.DateTimeField()
+    url = models.URLField(max_length=255, unique=True)
+    raw_html = models.ForeignKey('ArticleHtml', null=True, blank=True, default=None, on_delete=models.SET_NULL)
+    archived_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.url
 
 
+class UnparsedArticle(models.Model):
+    # 抓取成功但解析失敗的文章，HTML 已封存，修正解析器後由 reparse_articles 重新解析並存入 Article
+    board = models.ForeignKey('Board', on_delete=models.CASCADE)
+    url = models.URLField(max_length=255, unique=True)
+    raw_html = models.ForeignKey('ArticleHtml', on_delete=models.CASCADE)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.url
+
+
+class ArticleHtml(models.Model):
+    # 以未壓縮 HTML 的 sha256 為主鍵，內容以 zstd 壓縮
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
+class ArticleIndexState(models.Model):
+    # 每篇文章在各向量索引中的段落雜湊，用來判斷需要更新或刪除的段落
+    article = models.ForeignKey('Article', on_delete=models.CASCADE, related_name='index_states')
+    index_name = models.CharField(max_length=100)
+    content_hash = models.CharField(max_length=64)
+    chunk_hashes = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'index_name'], name='unique_article_index_state'),
+        ]
+
+    def __str__(self):
+        return f'{self.article_id} - {self.index_name}'
+
+
 class Board(models.Model):
     name = models.CharField(max_length=100, unique=True)
 
@@ -24,4 +86,59 @@ class Author(models.Model):
     name = models.CharField(max_length=100, unique=True)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class BoardCrawlState(models.Model):
+    board = models.OneToOneField('Board', on_delete=models.CASCADE, related_name='crawl_state')
+    last_index_page = models.IntegerField(null=True, blank=True, default=None)
+    last_article_url = models.URLField(max_length=255, null=True, blank=True, default=None)
+    enabled = models.BooleanField(default=True)
+    min_interval = models.IntegerField(default=300, help_text='最短爬取間隔（秒）')
+    max_interval = models.IntegerField(default=21600, help_text='最長爬取間隔（秒）')
+    posts_per_hour = models.FloatField(default=0)
+    last_crawled_at = models.DateTimeField(null=True, blank=True, default=None)
+    next_crawl_at = models.DateTimeField(null=True, blank=True, default=None)
+    failed_urls = models.JSONField(default=dict, blank=True, help_text='抓取失敗、下次爬取時重試的文章網址與失敗次數')
+    RETENTION_ACTION_CHOICES = [('vectors', '只刪除向量'), ('archive', '刪除向量並封存文章'), ('delete', '刪除向量與文章')]
+    retention_days = models.IntegerField(null=True, blank=True, default=None, help_text='保留天數，空白代表永久保留')
+    retention_action = models.CharField(max_length=20, choices=RETENTION_ACTION_CHOICES, default='vectors')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.board} - {self.last_index_page}'
+
+
+class VectorIndexAlias(models.Model):
+    # 搜尋與增量寫入使用的 namespace，重建索引完成後切換；沒有資料代表使用預設 namespace
+    index_name = models.CharField(max_length=100, unique=True)
+    namespace = models.CharField(max_length=100, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.index_name} -> {self.namespace}'
+
+
+class ReindexJob(models.Model):
+    STATUS_CHOICES = [('running', '重建中'), ('swapped', '已切換'), ('abandoned', '已放棄')]
+    namespace = models.CharField(max_length=100, unique=True)
+    index_names = models.JSONField(default=list)
+    max_article_id = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.namespace} - {self.status}'
+
+
+class ReindexRange(models.Model):
+    # 以文章 id 區間分配給各行程，last_id 為已寫入完成的最後一篇文章
+    job = models.ForeignKey('ReindexJob', on_delete=models.CASCADE, related_name='ranges')
+    start_id = models.BigIntegerField()
+    end_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    done = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.job_id}: {self.start_id}-{self.end_id} ({self.last_id})'
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from env_settings import settings
 from .models import Article
 
 
@@ -8,18 +9,34 @@ class ArticleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Article
-        fields = "__all__"
+        exclude = ("raw_html",)
 
 
-class QueryRequestSerializer(serializers.Serializer):
+class SearchQuerySerializer(serializers.Serializer):
     question = serializers.CharField(help_text="查詢內容", required=True, max_length=100, min_length=1)
     top_k = serializers.IntegerField(help_text="控制段落的查詢數量 (預設 3)", default=3, write_only=True, min_value=1,
-                                     max_value=10)
+                                     max_value=50)
+    author_name = serializers.CharField(help_text="只查詢特定發文者的文章", write_only=True, required=False)
+    board_name = serializers.CharField(help_text="只查詢特定看板的文章", write_only=True, required=False)
+    start_date = serializers.DateField(help_text="起始日期", write_only=True, required=False)
+    end_date = serializers.DateField(help_text="結束日期", write_only=True, required=False)
 
     answer = serializers.CharField(required=False, read_only=True)
     related_articles = ArticleSerializer(many=True, read_only=True)
 
 
+class QueryRequestSerializer(SearchQuerySerializer):
+    stream = serializers.BooleanField(help_text="是否以 Server-Sent Events 串流回傳回答 (預設 false)", default=False,
+                                      write_only=True)
+
+
+class BatchQueryRequestSerializer(serializers.Serializer):
+    queries = SearchQuerySerializer(many=True, help_text="問題列表，回傳結果依相同順序排列", min_length=1,
+                                    max_length=settings.batch_search_max_queries)
+    retrieval_only = serializers.BooleanField(help_text="只回傳相關文章，不請求 LLM 回答 (預設 false)", default=False,
+                                              write_only=True)
+
+
 class ArticleListRequestSerializer(serializers.Serializer):
     author_name = serializers.CharField(help_text="作者名稱", write_only=True, required=False)
     board_name = serializers.CharField(help_text="看板名稱", write_only=True, required=False)
@@ -5,5 +5,7 @@ urlpatterns = [
     path('posts/<int:pk>/', views.ArticleDetailView.as_view(), name='article-detail'),
     path('statistics/', views.ArticleStatisticsView.as_view(), name='article-statistics'),
     path('search/', views.SearchAPIView.as_view(), name='search'),
+    path('search/batch/', views.BatchSearchAPIView.as_view(), name='search-batch'),
+    path('search/stats/', views.SearchStatsView.as_view(), name='search-stats'),
 
 ]
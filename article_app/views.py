@@ -1,18 +1,40 @@
+import asyncio
+import json
 from datetime import datetime, time
+from time import perf_counter
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.decorators import classonlymethod
 from rest_framework import status, serializers
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.pagination import LimitOffsetPagination
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, inline_serializer
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.prompts import PromptTemplate
-from langchain_pinecone import PineconeVectorStore
 from .models import Article
-from .serializers import ArticleSerializer, QueryRequestSerializer, ArticleListRequestSerializer
-from env_settings import settings
-from pinecone import Pinecone
+from .serializers import (ArticleSerializer, QueryRequestSerializer, ArticleListRequestSerializer,
+                          BatchQueryRequestSerializer, SearchQuerySerializer)
 import traceback
 from log_app.models import Log
+from env_settings import settings
+from rag_app.answer_cache import get_answer_cache_stats, get_cached_answer, set_cached_answer
+from rag_app.context import build_context
+from rag_app.embeddings import get_embeddings, get_query_embeddings
+from rag_app.llm import get_async_chat_model
+from rag_app.lexical import reciprocal_rank_fusion
+from rag_app.rerank import limit_per_article, mmr_rerank, query_candidates
+from rag_app.vector_stores import aget_active_namespace, get_connection_stats, get_index, lexical_search
+
+PTT_TEMPLATE = PromptTemplate(
+    input_variables=["merge_text", "question"],
+    template="""
+    根據以下PTT的文章內容回答問題：{merge_text}
+    問題：{question}
+    回答：回傳格式為純文字，例如：
+    "根據最近 PTT 討論，..."
+    """
+)
 
 
 def articles_filter(article_list_request_serializer):
@@ -36,6 +58,25 @@ def articles_filter(article_list_request_serializer):
     return articles
 
 
+def get_search_filter(validated_data: dict) -> dict:
+    """將看板、作者與日期條件轉成向量查詢的 metadata 過濾條件，沒有條件時回傳 None。"""
+    search_filter = {}
+    if validated_data.get("board_name"):
+        search_filter["board"] = {"$eq": validated_data["board_name"]}
+    if validated_data.get("author_name"):
+        search_filter["author"] = {"$eq": validated_data["author_name"]}
+    post_timestamp = {}
+    start_date = validated_data.get("start_date")
+    end_date = validated_data.get("end_date")
+    if start_date:
+        post_timestamp["$gte"] = int(timezone.make_aware(datetime.combine(start_date, time.min)).timestamp())
+    if end_date:
+        post_timestamp["$lte"] = int(timezone.make_aware(datetime.combine(end_date, time.max)).timestamp())
+    if post_timestamp:
+        search_filter["post_timestamp"] = post_timestamp
+    return search_filter or None
+
+
 class ArticleListView(APIView):
     @extend_schema(
         description="取得最新 50 篇文章，可使用 limit、offset 進行分頁，可使用作者名稱、版面、時間範圍進行過濾。",
@@ -118,83 +159,357 @@ class ArticleStatisticsView(APIView):
         return Response({"total_articles": total_articles})
 
 
-class SearchAPIView(APIView):
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def elapsed_ms(started: float) -> float:
+    return round((perf_counter() - started) * 1000, 1)
+
+
+def get_candidate_count(top_k: int) -> int:
+    # MMR 與融合排序時多取一些候選段落
+    count = top_k * settings.mmr_fetch_multiplier if settings.mmr_enabled else top_k
+    return max(count, settings.hybrid_candidate_count) if settings.lexical_search else count
+
+
+async def run_lexical_search(namespace_task, question: str, k: int, search_filter: dict = None) -> list:
+    # namespace 查詢由多個工作共用，取消關鍵字查詢時不一併取消
+    namespace = await asyncio.shield(namespace_task)
+    return await sync_to_async(lexical_search, thread_sensitive=False)(
+        settings.search_index_name, namespace, question, k, search_filter)
+
+
+def start_lexical_search(namespace_task, question: str, top_k: int, search_filter: dict = None):
+    """在背景開始關鍵字查詢，未啟用時回傳 None。"""
+    if not settings.lexical_search:
+        return None
+    return asyncio.ensure_future(run_lexical_search(namespace_task, question, get_candidate_count(top_k),
+                                                    search_filter))
+
+
+async def retrieve_chunks(index, question_embedding: list, top_k: int, search_filter: dict = None,
+                          lexical_task=None) -> list:
+    """向量查詢結果以 MMR 重新排序後，與關鍵字查詢結果以 reciprocal rank fusion 合併，回傳 [(Document, 分數)]。"""
+    candidate_count = get_candidate_count(top_k)
+    # 向量查詢在執行緒池中以共用連線池的同步 client 執行；MMR 需要候選段落的向量，一併取回
+    results, vectors = await sync_to_async(query_candidates, thread_sensitive=False)(
+        index, question_embedding, candidate_count, search_filter, include_values=settings.mmr_enabled)
+    if settings.mmr_enabled:
+        results = mmr_rerank(question_embedding, results, vectors, candidate_count, settings.mmr_lambda,
+                             settings.max_chunks_per_article, settings.mmr_duplicate_threshold)
+    if lexical_task is not None:
+        try:
+            lexical_results = await lexical_task
+        except Exception as e:
+            # 關鍵字索引只用來補強召回，發生錯誤時只使用向量查詢結果
+            await Log.objects.acreate(level='WARNING', type='user-search', message=f'查詢關鍵字索引發生錯誤: {e}',
+                                      traceback=traceback.format_exc())
+            lexical_results = []
+        results = reciprocal_rank_fusion([results, lexical_results], len(results) + len(lexical_results),
+                                         settings.rrf_k)
+    return limit_per_article(results, top_k, settings.max_chunks_per_article)
+
+
+async def load_articles(article_ids) -> dict:
+    return {article.id: article async for article in
+            Article.objects.filter(id__in=article_ids).select_related('board', 'author')}
+
+
+class AsyncAPIView(APIView):
+    """handler 為 async def 的 APIView，ASGI 下不佔用執行緒；驗證、權限與回應格式仍由 DRF 處理。"""
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        return markcoroutinefunction(view) if cls.view_is_async else view
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class SearchAPIView(AsyncAPIView):
     @extend_schema(
         methods=("POST",),
-        description="輸入question(問題)與top_k(想查詢的文章片段數)，藉由LLM與向量資料庫得到question、answer(相關回答)、related_articles(相關文章)。",
+        description="輸入question(問題)與top_k(想查詢的文章片段數)，藉由LLM與向量資料庫得到question、answer(相關回答)、related_articles(相關文章)。"
+                    "stream 為 true 時以 Server-Sent Events 回傳：先送出 related_articles 事件，再以 token 事件逐段送出回答，"
+                    "最後以 done 事件回傳各階段耗時（毫秒）。",
         request=QueryRequestSerializer,
         responses=QueryRequestSerializer
     )
-    def post(self, request):
+    async def post(self, request):
+        started = perf_counter()
+        timings = {}
         query_request_serializer = QueryRequestSerializer(data=request.data)
         if not query_request_serializer.is_valid():
-            Log.objects.create(level='ERROR', type='user-search', message='查詢參數不合法', )
+            await Log.objects.acreate(level='ERROR', type='user-search', message='查詢參數不合法', )
             return Response(query_request_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         question = query_request_serializer.validated_data.get("question")
         top_k = query_request_serializer.validated_data.get("top_k")
-        # 查詢Pinecone embeddings內容
+        stream = query_request_serializer.validated_data.get("stream")
+        search_filter = get_search_filter(query_request_serializer.validated_data)
+        # 問題嵌入、namespace 查詢與關鍵字查詢同時進行，期間先查詢答案快取；
+        # 資料庫查詢留在 event loop 上以 async ORM 執行，執行緒池只連線向量與關鍵字索引
+        embedding_task = asyncio.ensure_future(get_query_embeddings().aembed_query(question))
+        namespace_task = asyncio.ensure_future(aget_active_namespace(settings.search_index_name))
+        lexical_task = start_lexical_search(namespace_task, question, top_k, search_filter)
+        question_embedding = None
         try:
-            vector_store = PineconeVectorStore(
-                index=Pinecone(
-                    api_key=settings.pinecone_api_key
-                ).Index('ptt300'),
-                embedding=OpenAIEmbeddings(api_key=settings.openai_api_key)
-            )
-            top_k_results = vector_store.similarity_search_with_score(question, k=top_k, )
+            if settings.answer_cache_similarity_threshold is not None:
+                question_embedding = await embedding_task
+            cached_answer = await sync_to_async(get_cached_answer, thread_sensitive=False)(
+                question, top_k, question_embedding, search_filter)
         except Exception as e:
-            Log.objects.create(level='ERROR', type='user-search', message=f'查詢Pinecone embeddings內容發生錯誤: {e}',
-                               traceback=traceback.format_exc())
+            await Log.objects.acreate(level='WARNING', type='user-search', message=f'讀取答案快取發生錯誤: {e}',
+                                      traceback=traceback.format_exc())
+            cached_answer = None
+        if cached_answer is not None:
+            namespace_task.cancel()
+            embedding_task.cancel()
+            if lexical_task:
+                lexical_task.cancel()
+            if stream:
+                return self.stream_response(self.stream_cached_answer(cached_answer, started))
+            return Response(cached_answer, status=status.HTTP_200_OK)
+        # 查詢向量資料庫內容
+        try:
+            namespace, question_embedding = await asyncio.gather(namespace_task, embedding_task)
+            index = get_index(settings.search_index_name, namespace)
+            top_k_results = await retrieve_chunks(index, question_embedding, top_k, search_filter, lexical_task)
+        except Exception as e:
+            await Log.objects.acreate(level='ERROR', type='user-search', message=f'查詢Pinecone embeddings內容發生錯誤: {e}',
+                                      traceback=traceback.format_exc())
             return Response({"error": f"查詢Pinecone embeddings內容發生錯誤: {str(e)}"},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        # # Test
-        # test_ids = [match[0].id for match in top_k_results]
-        # test_score=[match[1] for match in top_k_results]
-        # return Response({"test_ids": test_ids,'test_score':test_score})
-        # # ---
-        # 從資料庫找出文章內容並合併
+        timings['retrieval_ms'] = elapsed_ms(started)
+        # 依 token 預算組出文章段落，並依段落排名從資料庫取出相關文章
         try:
-            match_ids = [match[0].metadata['article_id'] for match in top_k_results]
-            query_request_serializer.related_articles = Article.objects.filter(id__in=match_ids)
-            merge_text = "\n".join(
-                [f"Title:{a.title} - Content:{a.content}" for a in query_request_serializer.related_articles])
-            if len(merge_text) > 128000:
-                Log.objects.create(level='ERROR', type='user-search', message='回傳文章總字數過長，請嘗試減少top_k')
-                return Response(
-                    {"error": "回傳文章總字數過長，請嘗試減少top_k"},
-                    status=status.HTTP_400_BAD_REQUEST)
-        except (KeyError, TypeError) as e:
-            Log.objects.create(level='ERROR', type='user-search', message=f'從資料庫找出文章內容發生錯誤: {e}',
-                               traceback=traceback.format_exc())
+            context = await sync_to_async(build_context, thread_sensitive=False)(top_k_results, index,
+                                                                                 settings.search_index_name)
+            articles = await load_articles(context.article_ids)
+            related_articles = [articles[article_id] for article_id in context.article_ids if article_id in articles]
+            merge_text = context.text
+        except (KeyError, TypeError, ValueError) as e:
+            await Log.objects.acreate(level='ERROR', type='user-search', message=f'組合文章段落發生錯誤: {e}',
+                                      traceback=traceback.format_exc())
             return Response(
-                {"error": f"從資料庫找出文章內容發生錯誤: {str(e)}"},
+                {"error": f"組合文章段落發生錯誤: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        timings['articles_ms'] = elapsed_ms(started)
+        if stream:
+            return self.stream_response(self.stream_answer(question, top_k, merge_text, related_articles,
+                                                           question_embedding, started, timings, search_filter))
         # 請求 ChatGPT 回答問題
         try:
-            model = ChatOpenAI(model="gpt-4o", temperature=0, api_key=settings.openai_api_key)
-            ptt_template = PromptTemplate(
-                input_variables=["merge_text", "question"],
-                template="""
-                根據以下PTT的文章內容回答問題：{merge_text}
-                問題：{question}
-                回答：回傳格式為純文字，例如：
-                "根據最近 PTT 討論，..."
-                """
-            )
-            chain = ptt_template | model
-            answer = chain.invoke({"merge_text": merge_text, "question": question}).content
+            chain = PTT_TEMPLATE | get_async_chat_model()
+            answer = (await chain.ainvoke({"merge_text": merge_text, "question": question})).content
         except Exception as e:
-            Log.objects.create(level='ERROR', type='user-search', message=f'請求ChatGPT回答發生錯誤: {e}',
-                               traceback=traceback.format_exc())
+            await Log.objects.acreate(level='ERROR', type='user-search', message=f'請求ChatGPT回答發生錯誤: {e}',
+                                      traceback=traceback.format_exc())
             return Response({"error": f"請求ChatGPT回答問題發生錯誤: {str(e)}"},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         try:
             serializer = QueryRequestSerializer(instance={
                 "question": question,
                 "answer": answer,
-                "related_articles": Article.objects.filter(id__in=match_ids),
+                "related_articles": related_articles,
             })
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            answer_data = serializer.data
         except Exception as e:
-            Log.objects.create(level='ERROR', type='user-search', message=f'序列化輸出資料失敗: {e}',
-                               traceback=traceback.format_exc())
+            await Log.objects.acreate(level='ERROR', type='user-search', message=f'序列化輸出資料失敗: {e}',
+                                      traceback=traceback.format_exc())
             return Response({'error': '序列化輸出資料失敗'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        try:
+            await sync_to_async(set_cached_answer, thread_sensitive=False)(
+                question, top_k, answer_data, question_embedding, search_filter)
+        except Exception as e:
+            await Log.objects.acreate(level='WARNING', type='user-search', message=f'寫入答案快取發生錯誤: {e}',
+                                      traceback=traceback.format_exc())
+        return Response(answer_data, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def stream_response(events) -> StreamingHttpResponse:
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # 避免 nginx 等反向代理緩衝整個回應
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    async def stream_cached_answer(cached_answer: dict, started: float):
+        yield sse_event('related_articles', cached_answer['related_articles'])
+        yield sse_event('token', {'text': cached_answer['answer']})
+        yield sse_event('done', {'cached': True, 'timings': {'total_ms': elapsed_ms(started)}})
+
+    @staticmethod
+    async def stream_answer(question: str, top_k: int, merge_text: str, related_articles: list, question_embedding,
+                            started: float, timings: dict, search_filter: dict = None):
+        related_articles_data = ArticleSerializer(related_articles, many=True).data
+        yield sse_event('related_articles', related_articles_data)
+        answer_parts = []
+        try:
+            chain = PTT_TEMPLATE | get_async_chat_model()
+            async for chunk in chain.astream({"merge_text": merge_text, "question": question}):
+                if not chunk.content:
+                    continue
+                timings.setdefault('first_token_ms', elapsed_ms(started))
+                answer_parts.append(chunk.content)
+                yield sse_event('token', {'text': chunk.content})
+        except Exception as e:
+            await Log.objects.acreate(level='ERROR', type='user-search', message=f'請求ChatGPT回答發生錯誤: {e}',
+                                      traceback=traceback.format_exc())
+            yield sse_event('error', {"error": f"請求ChatGPT回答問題發生錯誤: {str(e)}"})
+            return
+        timings['total_ms'] = elapsed_ms(started)
+        try:
+            await sync_to_async(set_cached_answer, thread_sensitive=False)(
+                question, top_k, {"question": question, "answer": ''.join(answer_parts),
+                                  "related_articles": related_articles_data}, question_embedding, search_filter)
+        except Exception as e:
+            await Log.objects.acreate(level='WARNING', type='user-search', message=f'寫入答案快取發生錯誤: {e}',
+                                      traceback=traceback.format_exc())
+        yield sse_event('done', {'cached': False, 'timings': timings})
+
+
+class BatchSearchAPIView(AsyncAPIView):
+    @extend_schema(
+        methods=("POST",),
+        description="一次查詢多個問題，queries 為 question、top_k 與過濾條件的列表，results 依相同順序回傳 question、answer、"
+                    "related_articles；個別問題請求 LLM 失敗時該筆改為回傳 error。所有問題以一次嵌入請求取得向量，向量查詢同時進行，"
+                    "相關文章以一次資料庫查詢取得。retrieval_only 為 true 時只回傳 related_articles，不請求 LLM 回答。",
+        request=BatchQueryRequestSerializer,
+        responses=inline_serializer(name='BatchQueryResponse', fields={
+            'results': SearchQuerySerializer(many=True, read_only=True),
+        })
+    )
+    async def post(self, request):
+        batch_request_serializer = BatchQueryRequestSerializer(data=request.data)
+        if not batch_request_serializer.is_valid():
+            await Log.objects.acreate(level='ERROR', type='user-search-batch', message='查詢參數不合法', )
+            return Response(batch_request_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        queries = batch_request_serializer.validated_data["queries"]
+        retrieval_only = batch_request_serializer.validated_data["retrieval_only"]
+        questions = [query["question"] for query in queries]
+        search_filters = [get_search_filter(query) for query in queries]
+        namespace_task = asyncio.ensure_future(aget_active_namespace(settings.search_index_name))
+        lexical_tasks = [start_lexical_search(namespace_task, query["question"], query["top_k"], search_filter)
+                         for query, search_filter in zip(queries, search_filters)]
+        # 所有問題以一次請求嵌入，同時查詢使用中的 namespace
+        try:
+            namespace, question_embeddings = await asyncio.gather(
+                namespace_task, get_query_embeddings().aembed_queries(questions))
+            index = get_index(settings.search_index_name, namespace)
+        except Exception as e:
+            await Log.objects.acreate(level='ERROR', type='user-search-batch', message=f'嵌入問題發生錯誤: {e}',
+                                      traceback=traceback.format_exc())
+            return Response({"error": f"嵌入問題發生錯誤: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        results = [None] * len(queries)
+        if not retrieval_only:
+            try:
+                results = await sync_to_async(self.get_cached_answers, thread_sensitive=False)(
+                    queries, question_embeddings, search_filters)
+            except Exception as e:
+                await Log.objects.acreate(level='WARNING', type='user-search-batch', message=f'讀取答案快取發生錯誤: {e}',
+                                          traceback=traceback.format_exc())
+        pending = [i for i, result in enumerate(results) if result is None]
+        for i, lexical_task in enumerate(lexical_tasks):
+            if lexical_task and results[i] is not None:
+                lexical_task.cancel()
+        # 各問題的向量查詢與段落組合同時進行
+        try:
+            top_k_results = await asyncio.gather(*[
+                retrieve_chunks(index, question_embeddings[i], queries[i]["top_k"], search_filters[i],
+                                lexical_tasks[i]) for i in pending])
+        except Exception as e:
+            await Log.objects.acreate(level='ERROR', type='user-search-batch', message=f'查詢Pinecone embeddings內容發生錯誤: {e}',
+                                      traceback=traceback.format_exc())
+            return Response({"error": f"查詢Pinecone embeddings內容發生錯誤: {str(e)}"},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        try:
+            contexts = await asyncio.gather(*[
+                sync_to_async(build_context, thread_sensitive=False)(chunk_results, index, settings.search_index_name)
+                for chunk_results in top_k_results])
+            # 所有問題的相關文章以一次查詢取出
+            articles = await load_articles({article_id for context in contexts for article_id in context.article_ids})
+        except (KeyError, TypeError, ValueError) as e:
+            await Log.objects.acreate(level='ERROR', type='user-search-batch', message=f'組合文章段落發生錯誤: {e}',
+                                      traceback=traceback.format_exc())
+            return Response({"error": f"組合文章段落發生錯誤: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        related_articles = [ArticleSerializer([articles[article_id] for article_id in context.article_ids
+                                               if article_id in articles], many=True).data for context in contexts]
+        if retrieval_only:
+            for i, articles_data in zip(pending, related_articles):
+                results[i] = {"question": questions[i], "related_articles": articles_data}
+            return Response({"results": results}, status=status.HTTP_200_OK)
+        # 請求 ChatGPT 回答問題，個別失敗的問題回傳 error
+        chain = PTT_TEMPLATE | get_async_chat_model()
+        outputs = await chain.abatch(
+            [{"merge_text": context.text, "question": questions[i]} for i, context in zip(pending, contexts)],
+            config={"max_concurrency": settings.llm_max_concurrency},
+            return_exceptions=True,
+        )
+        new_answers = []
+        for i, articles_data, output in zip(pending, related_articles, outputs):
+            if isinstance(output, Exception):
+                await Log.objects.acreate(level='ERROR', type='user-search-batch',
+                                          message=f'請求ChatGPT回答發生錯誤: {output}')
+                results[i] = {"question": questions[i], "error": f"請求ChatGPT回答問題發生錯誤: {str(output)}",
+                              "related_articles": articles_data}
+                continue
+            results[i] = {"question": questions[i], "answer": output.content, "related_articles": articles_data}
+            new_answers.append(i)
+        try:
+            await sync_to_async(self.set_cached_answers, thread_sensitive=False)(
+                [(queries[i], results[i], question_embeddings[i], search_filters[i]) for i in new_answers])
+        except Exception as e:
+            await Log.objects.acreate(level='WARNING', type='user-search-batch', message=f'寫入答案快取發生錯誤: {e}',
+                                      traceback=traceback.format_exc())
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def get_cached_answers(queries: list, question_embeddings: list, search_filters: list) -> list:
+        return [get_cached_answer(query["question"], query["top_k"], question_embedding, search_filter)
+                for query, question_embedding, search_filter in zip(queries, question_embeddings, search_filters)]
+
+    @staticmethod
+    def set_cached_answers(entries: list):
+        for query, answer, question_embedding, search_filter in entries:
+            set_cached_answer(query["question"], query["top_k"], answer, question_embedding, search_filter)
+
+
+class SearchStatsView(APIView):
+    @extend_schema(
+        description="取得本行程答案快取、查詢嵌入快取、嵌入快取與向量資料庫連線的統計資訊。",
+        responses={
+            200: OpenApiResponse(response={"type": "object", "properties": {
+                "answer_cache": {"type": "object"},
+                "query_embedding_cache": {"type": "object"},
+                "embedding_cache": {"type": "object"},
+                "vector_connections": {"type": "object"},
+            }}),
+        }
+    )
+    def get(self, request):
+        return Response({
+            "answer_cache": get_answer_cache_stats(),
+            "query_embedding_cache": get_query_embeddings().stats(),
+            "embedding_cache": get_embeddings().stats(),
+            "vector_connections": get_connection_stats(),
+        })
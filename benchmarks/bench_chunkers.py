@@ -0,0 +1,73 @@
+"""比較 rag_app.chunker 與 LangChain RecursiveCharacterTextSplitter 的切段速度與段落 token 數。
+
+使用方式： python benchmarks/bench_chunkers.py [--rounds 200] [--model text-embedding-ada-002]
+文章內容取自 fixtures/ptt 下的文章頁，profile 與 settings.index_profiles 預設值相同。
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+FIXTURE_DIR = Path(__file__).resolve().parent / 'fixtures' / 'ptt'
+sys.path.insert(0, str(BASE_DIR))
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter  # noqa: E402
+
+from celery_app import parsers  # noqa: E402
+from rag_app.chunker import TEXT_SEPARATORS, TokenChunker, get_encoding  # noqa: E402
+
+PROFILES = [(100, 20), (300, 60), (500, 100)]
+
+
+def load_contents() -> list:
+    return [parsers.bs4_get_data_from_article_html(path.read_text(encoding='utf-8'), path.stem.split('_')[1])['content']
+            for path in sorted(FIXTURE_DIR.glob('article_*.html'))]
+
+
+def bench(function, contents: list, rounds: int) -> tuple:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for content in contents:
+            function(content)
+    return rounds * len(contents) / (time.perf_counter() - start), [function(content) for content in contents]
+
+
+def describe(name: str, rate: float, outputs: list, encoding):
+    print(f'{name:>22}: {rate:10.1f} articles/sec')
+    for profile_index, (chunk_size, _) in enumerate(PROFILES):
+        tokens = [len(encoding.encode_ordinary(chunk)) for output in outputs for chunk in output[profile_index]]
+        over = sum(count > chunk_size for count in tokens)
+        print(f'{"":>24}chunk_size={chunk_size}: {len(tokens)} 段，最大 {max(tokens, default=0)} tokens，超過上限 {over} 段')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--model', default='text-embedding-ada-002')
+    args = parser.parse_args()
+    contents = load_contents()
+    encoding = get_encoding(args.model)
+    print(f'文章 {len(contents)} 篇，平均 {sum(map(len, contents)) / len(contents):.0f} 字，每篇重複 {args.rounds} 次')
+
+    # 目前的作法：每個 profile 各自以字數切段
+    char_splitters = [RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                                     separators=TEXT_SEPARATORS)
+                      for chunk_size, chunk_overlap in PROFILES]
+    rate, outputs = bench(lambda text: [splitter.split_text(text) for splitter in char_splitters], contents, args.rounds)
+    describe('langchain (chars)', rate, outputs, encoding)
+
+    # LangChain 以 token 計算長度，每個 profile 各自掃描
+    token_splitters = [RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        model_name=args.model, chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=TEXT_SEPARATORS)
+        for chunk_size, chunk_overlap in PROFILES]
+    rate, outputs = bench(lambda text: [splitter.split_text(text) for splitter in token_splitters], contents, args.rounds)
+    describe('langchain (tokens)', rate, outputs, encoding)
+
+    chunker = TokenChunker(TEXT_SEPARATORS, encoding)
+    rate, outputs = bench(lambda text: chunker.split(text, PROFILES), contents, args.rounds)
+    describe('rag_app.chunker', rate, outputs, encoding)
+
+
+if __name__ == '__main__':
+    main()
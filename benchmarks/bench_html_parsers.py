@@ -0,0 +1,77 @@
+"""比較各 HTML 解析後端的速度，並確認輸出與 BeautifulSoup 完全相同。
+
+使用方式： python benchmarks/bench_html_parsers.py [--rounds 200]
+fixtures/ptt 下 article_<看板>_<文章編號>.html 為文章頁，index_<看板>.html 為看板列表頁。
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+FIXTURE_DIR = Path(__file__).resolve().parent / 'fixtures' / 'ptt'
+sys.path.insert(0, str(BASE_DIR))
+
+from celery_app import parsers  # noqa: E402
+
+
+def load_fixtures() -> tuple:
+    articles = []
+    indexes = []
+    for path in sorted(FIXTURE_DIR.glob('*.html')):
+        html = path.read_text(encoding='utf-8')
+        if path.name.startswith('article_'):
+            articles.append((path.name, html, path.stem.split('_')[1]))
+        elif path.name.startswith('index_'):
+            indexes.append((path.name, html))
+    return articles, indexes
+
+
+def check_outputs(articles: list, indexes: list) -> list:
+    mismatches = []
+    for backend, functions in parsers.BACKENDS.items():
+        for name, html, board in articles:
+            if functions['article'] is parsers.bs4_get_data_from_article_html:
+                continue
+            try:
+                output = functions['article'](html, board)
+            except parsers.UnsupportedHtml:
+                continue
+            if output != parsers.bs4_get_data_from_article_html(html, board):
+                mismatches.append((backend, name))
+        for name, html in indexes:
+            if functions['board_urls'](html) != parsers.bs4_get_urls_from_board_html(html):
+                mismatches.append((backend, name))
+            if functions['prev_index_page'](html) != parsers.bs4_get_prev_index_page(html):
+                mismatches.append((backend, name))
+    return mismatches
+
+
+def bench(function, pages: list, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for args in pages:
+            function(*args)
+    return rounds * len(pages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+    articles, indexes = load_fixtures()
+    mismatches = check_outputs(articles, indexes)
+    for backend, name in mismatches:
+        print(f'輸出不一致: {backend} {name}')
+    print(f'文章頁 {len(articles)} 個，看板頁 {len(indexes)} 個，每個重複 {args.rounds} 次')
+    for backend, functions in parsers.BACKENDS.items():
+        article_rate = bench(functions['article'], [(html, board) for _, html, board in articles], args.rounds)
+        index_rate = bench(functions['board_urls'], [(html,) for _, html in indexes], args.rounds)
+        print(f'{backend:>5}: 文章頁 {article_rate:10.1f} pages/sec, 看板頁 {index_rate:10.1f} pages/sec')
+    if 'lxml' not in parsers.BACKENDS:
+        print('未安裝 lxml，只測試 bs4')
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import hashlib
+
+import zstandard
+
+from article_app.models import ArticleHtml
+from celery_app import parsers
+from env_settings import settings
+
+
+def get_html_sha256(html: str) -> str:
+    return hashlib.sha256(html.encode()).hexdigest()
+
+
+def compress_html(html: str) -> bytes:
+    return zstandard.ZstdCompressor(level=10).compress(html.encode())
+
+
+def decompress_html(data: bytes) -> str:
+    return zstandard.ZstdDecompressor().decompress(bytes(data)).decode()
+
+
+def archive_html_list(html_list: list) -> list:
+    """以內容雜湊存入壓縮後的 HTML，依輸入順序回傳 sha256。"""
+    sha256_list = [get_html_sha256(html) for html in html_list]
+    unique_html = dict(zip(sha256_list, html_list))
+    existing = set(ArticleHtml.objects.filter(sha256__in=unique_html.keys()).values_list('sha256', flat=True))
+    ArticleHtml.objects.bulk_create([
+        ArticleHtml(sha256=sha256, data=compress_html(html))
+        for sha256, html in unique_html.items() if sha256 not in existing
+    ], ignore_conflicts=True)
+    return sha256_list
+
+
+def parse_archived_html(item: tuple) -> tuple:
+    # 於子行程執行，item 為 (文章 id, 看板, 壓縮後的 HTML)
+    article_id, board, data = item
+    try:
+        return article_id, parsers.get_data_from_article_html(decompress_html(data), board,
+                                                               backend=settings.html_parser_backend), None
+    except Exception as e:
+        return article_id, None, str(e)
@@ -1,130 +1,160 @@
-from pinecone import Pinecone
+from functools import lru_cache, partial
+import hashlib
+import json
+from django.db import connection
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from env_settings import settings
-from langchain_core.documents import Document
-from langchain_pinecone import PineconeVectorStore
+from env_settings import settings, IndexProfile
 from ptt_rag.celery import app
-from article_app.models import Article
+from article_app.models import Article, ArticleIndexState
+from log_app.models import Log
+from rag_app.answer_cache import bump_answer_cache_version
+from rag_app.chunker import get_chunker
+from rag_app.embeddings import get_embeddings
+from rag_app.vector_stores import get_active_namespaces, get_index, get_state_name, get_vector_id
+from celery_app.index_pipeline import IndexPipeline, batched
 
 
-@app.task()
-def store_data_in_pinecone(article_id_list: list):
-    vector_store = PineconeVectorStore(
-        index=Pinecone(
-            api_key=settings.pinecone_api_key
-        ).Index(settings.pinecone_index_name),
-        embedding=OpenAIEmbeddings(api_key=settings.openai_api_key)
-    )
-    documents = []
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=100,
-        chunk_overlap=20,
-        separators=["\n\n","\n---\n","\n--\n", "\n", "。", "！", "？", "，", " ", ""]
-    )
-    for article in Article.objects.filter(id__in=article_id_list).all():
-        chunks = text_splitter.split_text(article.content)
-        for i, chunk in enumerate(chunks):
-            documents.append(Document(
-                page_content=chunk,
-                metadata={
-                    "article_id": article.id,
-                    "board": article.board.name,
-                    "title": article.title,
-                    "author": article.author.name,
-                    "post_time": str(article.post_time),
-                    "url": article.url,
-                    "chunk_index": i
-                }
-            ))
-    vector_store.add_documents(documents=documents)
-
-    # Test0
-    vector_store = PineconeVectorStore(
-        index=Pinecone(
-            api_key=settings.pinecone_api_key
-        ).Index('ptt100'),
-        embedding=OpenAIEmbeddings(api_key=settings.openai_api_key)
-    )
-    documents = []
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=100,
-        chunk_overlap=20,
-        separators=["\n\n", "\n---\n", "\n--\n", "\n", "。", "！", "？", "，", " ", ""]
-    )
-    for article in Article.objects.filter(id__in=article_id_list).all():
-        chunks = text_splitter.split_text(article.content)
-        for i, chunk in enumerate(chunks):
-            documents.append(Document(
-                page_content=chunk,
-                metadata={
-                    "article_id": article.id,
-                    "board": article.board.name,
-                    "title": article.title,
-                    "author": article.author.name,
-                    "post_time": str(article.post_time),
-                    "url": article.url,
-                    "chunk_index": i
-                }
-            ))
-    vector_store.add_documents(documents=documents)
-
-    # Test1
-    vector_store = PineconeVectorStore(
-        index=Pinecone(
-            api_key=settings.pinecone_api_key
-        ).Index('ptt300'),
-        embedding=OpenAIEmbeddings(api_key=settings.openai_api_key)
-    )
-    documents = []
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=300,
-        chunk_overlap=60,
-        separators=["\n\n", "\n---\n", "\n--\n", "\n", "。", "！", "？", "，", " ", ""]
-    )
-    for article in Article.objects.filter(id__in=article_id_list).all():
-        chunks = text_splitter.split_text(article.content)
-        for i, chunk in enumerate(chunks):
-            documents.append(Document(
-                page_content=chunk,
-                metadata={
-                    "article_id": article.id,
-                    "board": article.board.name,
-                    "title": article.title,
-                    "author": article.author.name,
-                    "post_time": str(article.post_time),
-                    "url": article.url,
-                    "chunk_index": i
-                }
-            ))
-    vector_store.add_documents(documents=documents)
-
-    # Test2
-    vector_store = PineconeVectorStore(
-        index=Pinecone(
-            api_key=settings.pinecone_api_key
-        ).Index('ptt500'),
-        embedding=OpenAIEmbeddings(api_key=settings.openai_api_key)
-    )
-    documents = []
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=100,
-        separators=["\n\n", "\n---\n", "\n--\n", "\n", "。", "！", "？", "，", " ", ""]
+@lru_cache
+def get_text_splitter(chunk_size: int, chunk_overlap: int, separators: tuple) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=list(separators)
     )
-    for article in Article.objects.filter(id__in=article_id_list).all():
-        chunks = text_splitter.split_text(article.content)
-        for i, chunk in enumerate(chunks):
-            documents.append(Document(
-                page_content=chunk,
-                metadata={
-                    "article_id": article.id,
-                    "board": article.board.name,
-                    "title": article.title,
-                    "author": article.author.name,
-                    "post_time": str(article.post_time),
-                    "url": article.url,
-                    "chunk_index": i
-                }
-            ))
-    vector_store.add_documents(documents=documents)
\ No newline at end of file
+
+
+def split_articles(articles: list, profile: IndexProfile) -> list:
+    text_splitter = get_text_splitter(profile.chunk_size, profile.chunk_overlap, tuple(profile.separators))
+    return [(article, i, chunk) for article in articles for i, chunk in enumerate(text_splitter.split_text(article.content))]
+
+
+def split_articles_by_profile(articles: list, profiles: list) -> dict:
+    """回傳 {索引名稱: [(文章, 段落序號, 段落)]}；token 切段時每篇文章只掃描一次即算出所有 profile 的段落。"""
+    if settings.chunker_backend == 'langchain':
+        return {profile.index_name: split_articles(articles, profile) for profile in profiles}
+    results = {profile.index_name: [] for profile in profiles}
+    profile_groups = {}
+    for profile in profiles:
+        profile_groups.setdefault(tuple(profile.separators), []).append(profile)
+    for separators, group in profile_groups.items():
+        chunker = get_chunker(separators, settings.embedding_model)
+        sizes = [(profile.chunk_size, profile.chunk_overlap) for profile in group]
+        for article in articles:
+            for profile, chunks in zip(group, chunker.split(article.content, sizes)):
+                results[profile.index_name].extend((article, i, chunk) for i, chunk in enumerate(chunks))
+    return results
+
+
+def get_chunk_metadata(article: Article, chunk_index: int, chunk: str) -> dict:
+    # text 為 VectorStore 讀取段落內容時使用的欄位
+    return {
+        "article_id": article.id,
+        "board": article.board.name,
+        "title": article.title,
+        "author": article.author.name,
+        "post_time": str(article.post_time),
+        # 供查詢時以日期範圍過濾
+        "post_timestamp": int(article.post_time.timestamp()),
+        "url": article.url,
+        "chunk_index": chunk_index,
+        "text": chunk,
+    }
+
+
+def get_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def plan_index_updates(articles: list, profile: IndexProfile, states: dict, namespace: str = '',
+                       split_chunks: list = None) -> tuple:
+    """比對段落雜湊，回傳 (需寫入的段落, 需刪除的向量 id, 新的索引狀態)。split_chunks 為已切好的段落。"""
+    state_name = get_state_name(profile.index_name, namespace)
+    if split_chunks is None:
+        split_chunks = split_articles_by_profile(articles, [profile])[profile.index_name]
+    article_chunks = {}
+    for article, chunk_index, chunk in split_chunks:
+        metadata = get_chunk_metadata(article, chunk_index, chunk)
+        chunk_hash = get_hash(json.dumps(metadata, ensure_ascii=False, sort_keys=True))
+        article_chunks.setdefault(article.id, []).append((chunk_index, chunk, metadata, chunk_hash))
+    upserts = []
+    delete_ids = []
+    new_states = []
+    for article in articles:
+        chunks = article_chunks.get(article.id, [])
+        chunk_hashes = [chunk_hash for _, _, _, chunk_hash in chunks]
+        content_hash = get_hash(''.join(chunk_hashes))
+        state = states.get((article.id, state_name))
+        if state and state.content_hash == content_hash:
+            continue
+        old_hashes = state.chunk_hashes if state else []
+        for chunk_index, chunk, metadata, chunk_hash in chunks:
+            if chunk_index >= len(old_hashes) or old_hashes[chunk_index] != chunk_hash:
+                upserts.append((get_vector_id(article.id, profile.index_name, chunk_index), chunk, metadata))
+        delete_ids.extend(get_vector_id(article.id, profile.index_name, chunk_index)
+                          for chunk_index in range(len(chunks), len(old_hashes)))
+        new_states.append(ArticleIndexState(article_id=article.id, index_name=state_name,
+                                            content_hash=content_hash, chunk_hashes=chunk_hashes))
+    return upserts, delete_ids, new_states
+
+
+def save_index_states(new_states: list):
+    # MySQL 的 ON DUPLICATE KEY UPDATE 依唯一索引判斷衝突，不接受 unique_fields
+    unique_fields = ['article', 'index_name'] if connection.features.supports_update_conflicts_with_target else None
+    ArticleIndexState.objects.bulk_create(new_states, update_conflicts=True, unique_fields=unique_fields,
+                                          update_fields=['content_hash', 'chunk_hashes', 'updated_at'])
+
+
+def iter_index_groups(articles, namespaces: dict):
+    """每批文章產生一組 (要寫入的段落, 要刪除的向量 id, 完成後儲存索引狀態)，namespaces 為 {索引名稱: namespace}。"""
+    for article_batch in batched(articles, settings.index_article_batch_size):
+        states = {(state.article_id, state.index_name): state
+                  for state in ArticleIndexState.objects.filter(article_id__in=[article.id for article in article_batch])}
+        records = []
+        delete_ids = {}
+        new_states = []
+        profiles = [profile for profile in settings.index_profiles if profile.index_name in namespaces]
+        profile_chunks = split_articles_by_profile(article_batch, profiles)
+        for profile in profiles:
+            upserts, profile_delete_ids, profile_states = plan_index_updates(article_batch, profile, states,
+                                                                             namespaces[profile.index_name],
+                                                                             profile_chunks[profile.index_name])
+            records.extend((profile.index_name, vector_id, chunk, metadata) for vector_id, chunk, metadata in upserts)
+            delete_ids[profile.index_name] = profile_delete_ids
+            new_states.extend(profile_states)
+        yield records, delete_ids, partial(save_index_states, new_states)
+
+
+def get_index_names() -> list:
+    return list(dict.fromkeys(profile.index_name for profile in settings.index_profiles))
+
+
+def index_articles(groups, namespaces: dict) -> dict:
+    """以 IndexPipeline 執行 iter_index_groups 產生的各組資料，寫入 namespaces 指定的 namespace。"""
+    return IndexPipeline(get_embeddings(), lambda index_name: get_index(index_name, namespaces[index_name])).run(groups)
+
+
+@app.task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def store_data_in_pinecone(article_id_list: list):
+    """將文章依 settings.index_profiles 切段後寫入各索引使用中的 namespace。
+
+    文章已由 scrape_articles 存入資料庫，重試 scrape_articles 不會再傳回這些 id，因此寫入失敗時由本任務自行重試；
+    已寫入的段落依索引狀態略過，重試不會重複嵌入。
+
+    向量 id 由文章 id、索引與段落序號決定，內容未變的文章不會重寫，變更的文章只更新有差異的段落並刪除多出的段落。
+    文章以串流方式讀取，嵌入與寫入以固定大小的批次併發執行。
+    """
+    if not article_id_list:
+        return
+    articles = Article.objects.filter(id__in=article_id_list).select_related('board', 'author').order_by('id')
+    namespaces = get_active_namespaces(get_index_names())
+    embeddings = get_embeddings()
+    hits, misses = embeddings.hits, embeddings.misses
+    stats = index_articles(iter_index_groups(articles.iterator(chunk_size=settings.index_article_batch_size), namespaces),
+                           namespaces)
+    if stats['upsert'].count or stats['delete'].count:
+        # 索引內容已變更（包含只刪除多出段落的情況），先前快取的答案不再使用
+        bump_answer_cache_version()
+    Log.objects.create(level='INFO', type='embedding',
+                       message=f'{", ".join(str(stage) for stage in stats.values())}；'
+                               f'快取命中 {embeddings.hits - hits} 段、未命中 {embeddings.misses - misses} 段，'
+                               f'累計命中率 {embeddings.stats()["hit_rate"]:.1%}')
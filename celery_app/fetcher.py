@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from env_settings import settings
+
+PTT_URL = 'https://www.ptt.cc'
+OVER18_URL = PTT_URL + '/ask/over18'
+
+
+class PttFetcher:
+    """每個 worker 共用一個已通過滿 18 歲確認的 Session，並以執行緒池併發抓取頁面。"""
+
+    def __init__(self, max_workers: int, per_host_limit: int, delay: float, timeout: float):
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.delay = delay
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._over18_lock = threading.Lock()
+        self._over18 = False
+        self._hosts_lock = threading.Lock()
+        self._host_semaphores = {}
+        self._host_locks = {}
+        self._host_next_time = {}
+
+    def _ensure_over18(self, force: bool = False):
+        with self._over18_lock:
+            if self._over18 and not force:
+                return
+            self.session.post(OVER18_URL, data={"from": "/bbs/index.html", "yes": "yes"}, timeout=self.timeout)
+            self._over18 = True
+
+    def _host_slot(self, host: str):
+        with self._hosts_lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_locks[host] = threading.Lock()
+                self._host_next_time[host] = 0.0
+            return self._host_semaphores[host], self._host_locks[host]
+
+    def _wait_turn(self, host: str, host_lock: threading.Lock):
+        # 同一主機的請求之間至少間隔 delay 秒
+        with host_lock:
+            wait = self._host_next_time[host] - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._host_next_time[host] = time.monotonic() + self.delay
+
+    def get(self, url: str) -> str:
+        self._ensure_over18()
+        host = urlparse(url).netloc
+        semaphore, host_lock = self._host_slot(host)
+        with semaphore:
+            self._wait_turn(host, host_lock)
+            response = self.session.get(url, timeout=self.timeout)
+            # cookie 失效時會被導回滿 18 歲確認頁，重新確認後再抓一次
+            if OVER18_URL in response.url:
+                self._ensure_over18(force=True)
+                self._wait_turn(host, host_lock)
+                response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.text
+
+    def _get_or_error(self, url: str) -> tuple:
+        try:
+            return url, self.get(url), None
+        except Exception as e:
+            return url, None, e
+
+    def fetch_many(self, urls: list) -> list:
+        """併發抓取多個頁面，依輸入順序回傳 (url, html, error)。"""
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            return list(executor.map(self._get_or_error, urls))
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> PttFetcher:
+    # Celery prefork 會在 fork 後才第一次呼叫，因此每個 worker 行程各自擁有一個 Session
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = PttFetcher(
+                max_workers=settings.scrape_max_workers,
+                per_host_limit=settings.scrape_per_host_limit,
+                delay=settings.scrape_delay,
+                timeout=settings.scrape_timeout,
+            )
+        return _fetcher
@@ -0,0 +1,163 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import islice
+
+from tenacity import Retrying, stop_after_attempt, wait_exponential
+
+from env_settings import settings
+
+
+def batched(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def call_with_retry(fn, *args):
+    # 單一批次失敗時以指數退避重試，不影響其他批次
+    for attempt in Retrying(stop=stop_after_attempt(settings.index_max_attempts),
+                            wait=wait_exponential(multiplier=settings.index_retry_base_delay, max=30),
+                            reraise=True):
+        with attempt:
+            return fn(*args)
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def record(self, count: int, started: float, finished: float):
+        with self._lock:
+            self.count += count
+            self.started = started if self.started is None else min(self.started, started)
+            self.finished = finished if self.finished is None else max(self.finished, finished)
+
+    @property
+    def rate(self) -> float:
+        if self.started is None or self.finished <= self.started:
+            return 0.0
+        return self.count / (self.finished - self.started)
+
+    def __str__(self):
+        return f'{self.name} {self.count} 筆 {self.rate:.1f} docs/sec'
+
+
+class BoundedExecutor:
+    """待處理工作達上限時 submit 會阻塞，讓上游停止產生資料。"""
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.semaphore = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def submit(self, fn, *args):
+        self.semaphore.acquire()
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self.semaphore.release()
+            raise
+        future.add_done_callback(lambda _: self.semaphore.release())
+        return future
+
+    def shutdown(self, cancel: bool = False):
+        self.executor.shutdown(wait=True, cancel_futures=cancel)
+
+
+class IndexPipeline:
+    """串流式的 切段 → 批次嵌入 → 批次寫入 流程。
+
+    run() 接收多組 (records, delete_ids, on_commit)：records 為 (索引名稱, 向量 id, 文字, metadata)，
+    一組的所有段落寫入完成後才刪除 delete_ids（{索引名稱: [向量 id]}）並呼叫 on_commit。
+    """
+
+    def __init__(self, embeddings, get_index):
+        self.embeddings = embeddings
+        self.get_index = get_index
+        self.embed_batch_size = settings.embed_batch_size
+        self.upsert_batch_size = settings.upsert_batch_size
+        self.stats = {name: StageStats(name) for name in ('chunk', 'embed', 'upsert', 'delete')}
+
+    def _embed(self, batch: list) -> list:
+        started = time.monotonic()
+        texts = list(dict.fromkeys(text for _, (_, _, text, _) in batch))
+        vectors = dict(zip(texts, call_with_retry(self.embeddings.embed_documents, texts)))
+        self.stats['embed'].record(len(batch), started, time.monotonic())
+        return [(group_id, record, vectors[record[2]]) for group_id, record in batch]
+
+    def _upsert(self, index_name: str, batch: list) -> list:
+        started = time.monotonic()
+        call_with_retry(self.get_index(index_name).upsert, [
+            {"id": vector_id, "values": vector, "metadata": metadata}
+            for _, (_, vector_id, _, metadata), vector in batch
+        ])
+        self.stats['upsert'].record(len(batch), started, time.monotonic())
+        return [group_id for group_id, _, _ in batch]
+
+    def _finish_group(self, group: dict):
+        for index_name, delete_ids in group['delete_ids'].items():
+            for ids in batched(delete_ids, 1000):
+                started = time.monotonic()
+                call_with_retry(self.get_index(index_name).delete, ids)
+                self.stats['delete'].record(len(ids), started, time.monotonic())
+        group['on_commit']()
+
+    def run(self, groups) -> dict:
+        embed_executor = BoundedExecutor(settings.embed_concurrency, settings.index_max_pending)
+        upsert_executor = BoundedExecutor(settings.upsert_concurrency, settings.index_max_pending)
+        pending_groups = {}
+        embed_buffer = []
+        upsert_buffers = {}
+        embed_futures = []
+        upsert_futures = []
+
+        def submit_upserts(flush: bool):
+            for index_name, buffer in upsert_buffers.items():
+                while len(buffer) >= self.upsert_batch_size or (flush and buffer):
+                    batch = buffer[:self.upsert_batch_size]
+                    del buffer[:self.upsert_batch_size]
+                    upsert_futures.append(upsert_executor.submit(self._upsert, index_name, batch))
+
+        def collect(block: bool):
+            if block:
+                wait(embed_futures)
+            for future in [future for future in embed_futures if future.done()]:
+                embed_futures.remove(future)
+                for group_id, record, vector in future.result():
+                    upsert_buffers.setdefault(record[0], []).append((group_id, record, vector))
+            submit_upserts(flush=block)
+            if block:
+                wait(upsert_futures)
+            for future in [future for future in upsert_futures if future.done()]:
+                upsert_futures.remove(future)
+                for group_id in future.result():
+                    pending_groups[group_id]['pending'] -= 1
+            for group_id in [group_id for group_id, group in pending_groups.items() if group['pending'] == 0]:
+                self._finish_group(pending_groups.pop(group_id))
+
+        try:
+            started = time.monotonic()
+            for group_id, (records, delete_ids, on_commit) in enumerate(groups):
+                self.stats['chunk'].record(len(records), started, time.monotonic())
+                pending_groups[group_id] = {'pending': len(records), 'delete_ids': delete_ids, 'on_commit': on_commit}
+                for record in records:
+                    embed_buffer.append((group_id, record))
+                    if len(embed_buffer) >= self.embed_batch_size:
+                        embed_futures.append(embed_executor.submit(self._embed, embed_buffer))
+                        embed_buffer = []
+                collect(block=False)
+                started = time.monotonic()
+            if embed_buffer:
+                embed_futures.append(embed_executor.submit(self._embed, embed_buffer))
+            collect(block=True)
+        except Exception:
+            embed_executor.shutdown(cancel=True)
+            upsert_executor.shutdown(cancel=True)
+            raise
+        embed_executor.shutdown()
+        upsert_executor.shutdown()
+        return self.stats
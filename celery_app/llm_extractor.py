@@ -0,0 +1,112 @@
+import hashlib
+
+from django.core.cache import cache
+from django.utils.dateparse import parse_datetime
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_openai import ChatOpenAI
+
+from celery_app.parsers import format_post_time, reduce_article_html
+from env_settings import settings
+
+LLM_CACHE_PREFIX = 'llm-extract'
+LLM_REQUIRED_FIELDS = ['board', 'title', 'author', 'post_time', 'content']
+
+
+def get_extraction_model():
+    return ChatOpenAI(model="gpt-4o", temperature=0, api_key=settings.openai_api_key)
+
+
+def get_extraction_chain(model=None):
+    parser = JsonOutputParser()
+    prompt = PromptTemplate(
+        template="Answer the user query.\n{format_instructions}\n{query}\n",
+        input_variables=["query"],
+        partial_variables={"format_instructions": parser.get_format_instructions()},
+    )
+    return prompt | (model or get_extraction_model()) | parser
+
+
+def build_extraction_query(text: str) -> str:
+    return f"""
+        以下是 PTT 文章頁面的文字內容，請幫我提取以下欄位：
+        - 看板 (board)
+        - 標題 (title)
+        - 作者 (author)
+        - 時間 (post_time)
+        - 內容 (content)
+
+        文章內容：
+        ```
+        {text}
+        ```
+
+        回傳格式為 JSON，例如：
+        {{
+            "board": "example_board",
+            "title": "example_title",
+            "author": "example_author",
+            "post_time": "example_time",
+            "content": "example_content"
+        }}
+        """
+
+
+def normalize_llm_data(data: dict) -> dict:
+    """檢查 LLM 回傳的欄位並統一格式，缺少欄位或時間無法解析時拋出 ValueError。"""
+    missing = [field for field in LLM_REQUIRED_FIELDS
+               if not isinstance(data.get(field), str) or not data[field].strip()]
+    if missing:
+        raise ValueError(f'LLM 回傳資料缺少欄位: {", ".join(missing)}')
+    data = dict(data)
+    data['author'] = data['author'].strip(')').split(' (')[0]
+    data['post_time'] = normalize_post_time(data['post_time'])
+    return data
+
+
+def normalize_post_time(time_str: str) -> str:
+    # 可能為 PTT 頁面上的原始格式，或已轉為 YYYY-MM-DD HH:MM:SS
+    try:
+        return format_post_time(time_str.strip())
+    except ValueError:
+        pass
+    dt = parse_datetime(time_str.strip())
+    if dt is None:
+        raise ValueError(f'無法解析 LLM 回傳的時間: {time_str}')
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def extract_articles_with_llm(html_list: list, model=None) -> list:
+    """以 LLM 解析多個頁面，依輸入順序回傳 dict，失敗的頁面回傳 Exception。
+
+    相同內容只會送出一次，通過檢查的結果以內容雜湊快取，重試與重新爬取時不會再次呼叫 LLM；
+    格式錯誤的結果不快取，重試時會重新請求 LLM。
+    """
+    texts = [reduce_article_html(html) for html in html_list]
+    keys = [f'{LLM_CACHE_PREFIX}:{hashlib.sha256(text.encode()).hexdigest()}' for text in texts]
+    results = {}
+    for key, data in cache.get_many(keys).items():
+        try:
+            results[key] = normalize_llm_data(data)
+        except Exception:
+            # 加入檢查前快取的錯誤結果，重新請求 LLM
+            continue
+    pending = {key: text for key, text in zip(keys, texts) if key not in results}
+    if pending:
+        outputs = get_extraction_chain(model).batch(
+            [{"query": build_extraction_query(text)} for text in pending.values()],
+            config={"max_concurrency": settings.llm_max_concurrency},
+            return_exceptions=True,
+        )
+        new_results = {}
+        for key, data in zip(pending.keys(), outputs):
+            if not isinstance(data, Exception):
+                try:
+                    data = normalize_llm_data(data)
+                except Exception as e:
+                    data = e
+            new_results[key] = data
+        cache.set_many({key: data for key, data in new_results.items() if not isinstance(data, Exception)},
+                       timeout=settings.llm_cache_timeout)
+        results.update(new_results)
+    return [results[key] for key in keys]
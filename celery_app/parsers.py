@@ -0,0 +1,198 @@
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+    import lxml.html
+except ImportError:
+    lxml = None
+
+PTT_URL = 'https://www.ptt.cc'
+INDEX_PAGE_PATTERN = re.compile(r'index(\d+)\.html')
+
+
+class UnsupportedHtml(Exception):
+    """lxml 無法保證與 BeautifulSoup 輸出相同時拋出，交由 BeautifulSoup 處理。"""
+
+
+def format_post_time(time_str: str) -> str:
+    dt = datetime.strptime(time_str, "%a %b %d %H:%M:%S %Y")
+    dt = dt.replace(tzinfo=ZoneInfo("Asia/Taipei"))
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def build_article_data(board: str, meta_values: list, content: str) -> dict:
+    return {
+        'board': board,
+        'title': meta_values[2],
+        'author': meta_values[0].strip(')').split(' (')[0],
+        'post_time': format_post_time(meta_values[3]),
+        'content': content,
+    }
+
+
+def reduce_article_html(html: str) -> str:
+    """只保留文章標頭與 #main-content 文字，作為 LLM 解析的輸入。"""
+    html_soup = BeautifulSoup(html, 'html.parser')
+    main_content = html_soup.find(id='main-content') or html_soup.body or html_soup
+    lines = []
+    if html_soup.title and html_soup.title.string:
+        lines.append(f'頁面標題: {html_soup.title.string.strip()}')
+    for metaline in main_content.find_all('div', class_=['article-metaline', 'article-metaline-right']):
+        meta_tag = metaline.find('span', class_='article-meta-tag')
+        meta_value = metaline.find('span', class_='article-meta-value')
+        if meta_tag and meta_value:
+            lines.append(f'{meta_tag.text}: {meta_value.text}')
+        metaline.decompose()
+    # 推文與圖片預覽不屬於文章內容
+    for element in main_content.find_all('div', class_=['push', 'richcontent']):
+        element.decompose()
+    lines.append(main_content.get_text().strip())
+    return "\n".join(lines)
+
+
+# BeautifulSoup (html.parser)
+
+def bs4_get_urls_from_board_html(html: str) -> list:
+    html_soup = BeautifulSoup(html, 'html.parser')
+    urls = []
+    for r_ent in html_soup.find_all('div', class_='r-ent'):
+        # 若無連結代表文章已刪除
+        a = r_ent.find('a')
+        if a and a.get('href'):
+            urls.append(PTT_URL + a['href'])
+    return urls
+
+
+def bs4_get_prev_index_page(html: str):
+    html_soup = BeautifulSoup(html, 'html.parser')
+    for a in html_soup.select('div.btn-group-paging a'):
+        if '上頁' in a.text and a.get('href'):
+            match = INDEX_PAGE_PATTERN.search(a['href'])
+            if match:
+                return int(match.group(1))
+    return None
+
+
+def bs4_get_data_from_article_html(html: str, board: str) -> dict:
+    html_soup = BeautifulSoup(html, 'html.parser')
+    article_soup = html_soup.find('div', class_='bbs-screen bbs-content')
+    meta_values = [span.text for span in article_soup.find_all('span', class_='article-meta-value')]
+    result = []
+    for element in article_soup.children:
+        if element.name not in ["div", "span"]:
+            text = element.get_text(strip=True) if element.name == "a" else str(element).strip()
+            if text:
+                result.append(text)
+    return build_article_data(board, meta_values, "\n".join(result).strip('-'))
+
+
+# lxml
+
+if lxml is not None:
+    def _class_xpath(path: str, tag: str, class_name: str):
+        return etree.XPath(f'{path}{tag}[contains(concat(" ", normalize-space(@class), " "), " {class_name} ")]')
+
+    _R_ENT_XPATH = _class_xpath('//', 'div', 'r-ent')
+    _PAGING_XPATH = _class_xpath('//', 'div', 'btn-group-paging')
+    _ARTICLE_XPATH = etree.XPath('//div[@class="bbs-screen bbs-content"]')
+    _META_VALUE_XPATH = _class_xpath('.//', 'span', 'article-meta-value')
+    _COMMENT_XPATH = etree.XPath('.//comment()')
+
+
+def lxml_get_urls_from_board_html(html: str) -> list:
+    root = lxml.html.document_fromstring(html)
+    urls = []
+    for r_ent in _R_ENT_XPATH(root):
+        a = next(r_ent.iter('a'), None)
+        if a is not None and a.get('href'):
+            urls.append(PTT_URL + a.get('href'))
+    return urls
+
+
+def lxml_get_prev_index_page(html: str):
+    root = lxml.html.document_fromstring(html)
+    for paging in _PAGING_XPATH(root):
+        for a in paging.iter('a'):
+            if '上頁' in a.text_content() and a.get('href'):
+                match = INDEX_PAGE_PATTERN.search(a.get('href'))
+                if match:
+                    return int(match.group(1))
+    return None
+
+
+def lxml_get_data_from_article_html(html: str, board: str) -> dict:
+    # html.parser 保留 \r 與註解，lxml 不同，這類頁面交給 BeautifulSoup
+    if '\r' in html:
+        raise UnsupportedHtml('carriage return')
+    root = lxml.html.document_fromstring(html)
+    article = _ARTICLE_XPATH(root)[0]
+    if _COMMENT_XPATH(article):
+        raise UnsupportedHtml('comment')
+    meta_values = [str(span.text_content()) for span in _META_VALUE_XPATH(article)]
+    result = []
+    text = (article.text or '').strip()
+    if text:
+        result.append(text)
+    for element in article:
+        if element.tag == 'a':
+            text = ''.join(s.strip() for s in element.itertext())
+            if text:
+                result.append(text)
+        elif element.tag not in ('div', 'span'):
+            # BeautifulSoup 會保留其他標籤的原始 HTML
+            raise UnsupportedHtml(element.tag)
+        text = (element.tail or '').strip()
+        if text:
+            result.append(text)
+    return build_article_data(board, meta_values, "\n".join(result).strip('-'))
+
+
+BACKENDS = {
+    'bs4': {
+        'board_urls': bs4_get_urls_from_board_html,
+        'prev_index_page': bs4_get_prev_index_page,
+        'article': bs4_get_data_from_article_html,
+    },
+}
+if lxml is not None:
+    BACKENDS['lxml'] = {
+        'board_urls': lxml_get_urls_from_board_html,
+        'prev_index_page': lxml_get_prev_index_page,
+        'article': lxml_get_data_from_article_html,
+    }
+
+
+def _get_backend(backend: str) -> dict:
+    return BACKENDS.get(backend, BACKENDS['bs4'])
+
+
+def get_urls_from_board_html(html: str, backend: str = 'lxml') -> list:
+    try:
+        return _get_backend(backend)['board_urls'](html)
+    except Exception:
+        if backend == 'bs4':
+            raise
+        return bs4_get_urls_from_board_html(html)
+
+
+def get_prev_index_page(html: str, backend: str = 'lxml'):
+    try:
+        return _get_backend(backend)['prev_index_page'](html)
+    except Exception:
+        if backend == 'bs4':
+            raise
+        return bs4_get_prev_index_page(html)
+
+
+def get_data_from_article_html(html: str, board: str, backend: str = 'lxml') -> dict:
+    try:
+        return _get_backend(backend)['article'](html, board)
+    except Exception:
+        # lxml 失敗時以 BeautifulSoup 重新解析，確保結果與原本一致
+        if backend == 'bs4':
+            raise
+        return bs4_get_data_from_article_html(html, board)
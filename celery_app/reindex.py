@@ -0,0 +1,113 @@
+from collections import deque
+from functools import partial
+
+from django.db import connections, transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from article_app.models import Article, ArticleIndexState, ReindexJob, ReindexRange, VectorIndexAlias
+from celery_app.data_processing import index_articles, iter_index_groups
+from celery_app.index_pipeline import batched
+from celery_app.retention import exclude_expired_articles
+from env_settings import settings
+from log_app.models import Log
+from rag_app.answer_cache import bump_answer_cache_version
+from rag_app.vector_stores import get_index, get_state_name
+
+
+def create_reindex_job(index_names: list, range_size: int) -> ReindexJob:
+    """建立重建工作，寫入新的 namespace，並將文章 id 切成多個區間。"""
+    bounds = Article.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+    with transaction.atomic():
+        job = ReindexJob.objects.create(namespace=f'reindex-{timezone.now():%Y%m%d%H%M%S}', index_names=index_names,
+                                        max_article_id=bounds['max_id'] or 0)
+        if bounds['min_id'] is not None:
+            ReindexRange.objects.bulk_create([
+                ReindexRange(job=job, start_id=start_id, end_id=min(start_id + range_size - 1, bounds['max_id']),
+                             last_id=start_id - 1)
+                for start_id in range(bounds['min_id'], bounds['max_id'] + 1, range_size)
+            ])
+    return job
+
+
+def get_job_namespaces(job: ReindexJob) -> dict:
+    return {index_name: job.namespace for index_name in job.index_names}
+
+
+class RangeCheckpoint:
+    """依序記錄已完成的文章批次；前面的批次都完成後才推進 last_id，中斷後從 last_id 之後繼續。"""
+
+    def __init__(self, reindex_range: ReindexRange):
+        self.reindex_range = reindex_range
+        self.pending = deque()
+
+    def wrap(self, articles, namespaces: dict):
+        for article_batch in batched(articles, settings.index_article_batch_size):
+            for records, delete_ids, on_commit in iter_index_groups(article_batch, namespaces):
+                entry = {'last_id': article_batch[-1].id, 'done': False}
+                self.pending.append(entry)
+                yield records, delete_ids, partial(self.commit, on_commit, entry)
+
+    def commit(self, on_commit, entry: dict):
+        on_commit()
+        entry['done'] = True
+        last_id = None
+        while self.pending and self.pending[0]['done']:
+            last_id = self.pending.popleft()['last_id']
+        if last_id is not None:
+            self.reindex_range.last_id = last_id
+            self.reindex_range.save(update_fields=['last_id', 'updated_at'])
+
+
+def reset_db_connections():
+    # 子行程不能沿用 fork 時父行程的資料庫連線；關閉會送出 COM_QUIT 中斷父行程的連線，只丟棄後由子行程重新連線
+    for connection in connections.all(initialized_only=True):
+        connection.connection = None
+
+
+def reindex_range(range_id: int) -> int:
+    """將一個 id 區間的文章寫入重建中的 namespace，回傳寫入的段落數。"""
+    reindex_range = ReindexRange.objects.select_related('job').get(id=range_id)
+    namespaces = get_job_namespaces(reindex_range.job)
+    articles = Article.objects.filter(id__gt=reindex_range.last_id, id__lte=reindex_range.end_id)
+    articles = exclude_expired_articles(articles)
+    articles = (articles.select_related('board', 'author').order_by('id')
+                .iterator(chunk_size=settings.index_article_batch_size))
+    stats = index_articles(RangeCheckpoint(reindex_range).wrap(articles, namespaces), namespaces)
+    reindex_range.done = True
+    reindex_range.save(update_fields=['done', 'updated_at'])
+    return stats['upsert'].count
+
+
+def catch_up(job: ReindexJob) -> int:
+    """補寫重建期間新增或重新寫入使用中 namespace 的文章；內容未變的文章依索引狀態略過。"""
+    namespaces = get_job_namespaces(job)
+    job_state_names = [get_state_name(index_name, job.namespace) for index_name in job.index_names]
+    updated_ids = (ArticleIndexState.objects.filter(updated_at__gte=job.created_at)
+                   .exclude(index_name__in=job_state_names).values('article_id'))
+    articles = exclude_expired_articles(Article.objects.filter(Q(id__gt=job.max_article_id) | Q(id__in=updated_ids)))
+    articles = (articles.select_related('board', 'author').order_by('id')
+                .iterator(chunk_size=settings.index_article_batch_size))
+    stats = index_articles(iter_index_groups(articles, namespaces), namespaces)
+    return stats['upsert'].count
+
+
+def swap_namespace(job: ReindexJob) -> dict:
+    """在同一個交易中將各索引切換到新的 namespace，回傳 {索引名稱: 舊 namespace}。"""
+    old_namespaces = {}
+    with transaction.atomic():
+        for index_name in job.index_names:
+            alias, _ = VectorIndexAlias.objects.select_for_update().get_or_create(index_name=index_name)
+            old_namespaces[index_name] = alias.namespace
+            alias.namespace = job.namespace
+            alias.save()
+        job.status = 'swapped'
+        job.save(update_fields=['status', 'updated_at'])
+    bump_answer_cache_version()
+    return old_namespaces
+
+
+def drop_namespace(index_name: str, namespace: str):
+    get_index(index_name, namespace).delete(delete_all=True)
+    ArticleIndexState.objects.filter(index_name=get_state_name(index_name, namespace)).delete()
+    Log.objects.create(level='INFO', type='reindex', message=f'已刪除 {index_name} 的舊 namespace "{namespace}"')
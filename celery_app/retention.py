@@ -0,0 +1,98 @@
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from article_app.models import ArchivedArticle, Article, ArticleIndexState, BoardCrawlState
+from celery_app.index_pipeline import batched, call_with_retry
+from env_settings import settings
+from log_app.models import Log
+from ptt_rag.celery import app
+from rag_app.answer_cache import bump_answer_cache_version
+from rag_app.vector_stores import get_index, get_vector_id
+
+ARCHIVE_FIELDS = ['id', 'board_id', 'title', 'author_id', 'content', 'post_time', 'url', 'raw_html_id']
+
+
+def exclude_expired_articles(articles):
+    """排除已超過看板保留天數的文章，這些文章的向量會被清除，不需要重新寫入。"""
+    expired = Q()
+    now = timezone.now()
+    for board_id, retention_days in BoardCrawlState.objects.filter(retention_days__isnull=False).values_list(
+            'board_id', 'retention_days'):
+        expired |= Q(board_id=board_id, post_time__lt=now - timedelta(days=retention_days))
+    return articles.exclude(expired) if expired else articles
+
+
+def delete_article_vectors(article_ids: list) -> int:
+    """依 ArticleIndexState 記錄的段落數組出各索引的向量 id 並批次刪除，回傳刪除的向量數。"""
+    vector_ids = {}
+    states = ArticleIndexState.objects.filter(article_id__in=article_ids)
+    for state in states.only('article_id', 'index_name', 'chunk_hashes'):
+        # index_name 為 get_state_name 的格式：<索引名稱>[@<namespace>]
+        index_name, _, namespace = state.index_name.partition('@')
+        vector_ids.setdefault((index_name, namespace), []).extend(
+            get_vector_id(state.article_id, index_name, chunk_index) for chunk_index in range(len(state.chunk_hashes)))
+    for (index_name, namespace), ids in vector_ids.items():
+        for batch in batched(ids, 1000):
+            call_with_retry(get_index(index_name, namespace).delete, batch)
+    states.delete()
+    return sum(len(ids) for ids in vector_ids.values())
+
+
+def archive_articles(article_ids: list):
+    with transaction.atomic():
+        ArchivedArticle.objects.bulk_create([
+            ArchivedArticle(**article) for article in Article.objects.filter(id__in=article_ids).values(*ARCHIVE_FIELDS)
+        ], ignore_conflicts=True)
+        Article.objects.filter(id__in=article_ids).delete()
+
+
+def apply_retention_policy(crawl_state: BoardCrawlState) -> dict:
+    """刪除看板中超過保留天數的文章向量，並依 retention_action 封存或刪除文章。"""
+    cutoff = timezone.now() - timedelta(days=crawl_state.retention_days)
+    articles = Article.objects.filter(board_id=crawl_state.board_id, post_time__lt=cutoff)
+    if crawl_state.retention_action == 'vectors':
+        # 文章保留在資料庫，只處理仍有向量的文章
+        articles = articles.filter(index_states__isnull=False).distinct()
+    reclaimed = {'vectors': 0, 'articles': 0}
+    last_id = 0
+    while True:
+        article_ids = list(articles.filter(id__gt=last_id).order_by('id')
+                           .values_list('id', flat=True)[:settings.retention_batch_size])
+        if not article_ids:
+            break
+        last_id = article_ids[-1]
+        reclaimed['vectors'] += delete_article_vectors(article_ids)
+        if crawl_state.retention_action == 'archive':
+            archive_articles(article_ids)
+            reclaimed['articles'] += len(article_ids)
+        elif crawl_state.retention_action == 'delete':
+            reclaimed['articles'] += Article.objects.filter(id__in=article_ids).delete()[1].get('article_app.Article', 0)
+    return reclaimed
+
+
+@app.task()
+def apply_retention_policies() -> dict:
+    """依各看板 BoardCrawlState.retention_days 清除過期文章的向量與資料，回傳 {看板: 回收數量}。"""
+    results = {}
+    crawl_states = BoardCrawlState.objects.filter(retention_days__isnull=False).select_related('board')
+    for crawl_state in crawl_states:
+        board = crawl_state.board.name
+        try:
+            results[board] = apply_retention_policy(crawl_state)
+        except Exception as e:
+            Log.objects.create(level='ERROR', type='retention', message=f'清除看板 {board} 過期資料時發生錯誤: {e}',
+                               traceback=traceback.format_exc())
+            continue
+        action = dict(BoardCrawlState.RETENTION_ACTION_CHOICES)[crawl_state.retention_action]
+        Log.objects.create(level='INFO', type='retention',
+                           message=f'看板 {board} 保留 {crawl_state.retention_days} 天（{action}），'
+                                   f'刪除向量 {results[board]["vectors"]} 筆、'
+                                   f'{"封存" if crawl_state.retention_action == "archive" else "刪除"}文章 '
+                                   f'{results[board]["articles"]} 篇')
+    if any(result['vectors'] or result['articles'] for result in results.values()):
+        bump_answer_cache_version()
+    return results
@@ -4,160 +4,353 @@ import django
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ptt_rag.settings")
 django.setup()
 
-import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
-from article_app.models import Article, Board, Author
+from article_app.models import Article, ArchivedArticle, Board, Author, BoardCrawlState, UnparsedArticle
 from log_app.models import Log
 from celery_app.data_processing import store_data_in_pinecone
+from celery_app.fetcher import get_fetcher
+from celery_app import parsers
 from ptt_rag.celery import app
-from langchain_openai import ChatOpenAI
-from langchain.chains import create_retrieval_chain
+from celery_app.llm_extractor import extract_articles_with_llm
+from celery_app.archive import archive_html_list
 from env_settings import settings
-from zoneinfo import ZoneInfo
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.prompts import PromptTemplate
-from celery import chain
+from celery import chain, chord
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta
 import traceback
+import re
 
 
 @app.task()
 def period_send_ptt_scrape_task():
-    board_list = ['Gossiping', 'NBA', 'Stock', 'LoL', 'home-sale']
-    for board in board_list:
-        chain(ptt_scrape.s(board), store_data_in_pinecone.s())()
+    """派送已到爬取時間的看板，看板與爬取設定存於 BoardCrawlState。"""
+    now = timezone.now()
+    due_crawl_states = BoardCrawlState.objects.filter(enabled=True).filter(
+        Q(next_crawl_at__isnull=True) | Q(next_crawl_at__lte=now)).select_related('board')
+    for crawl_state in due_crawl_states:
+        # 先以最短間隔推遲下次爬取時間，避免爬取完成前被重複派送；爬取成功後再依發文速度設定，失敗時很快會重新派送
+        crawl_state.next_crawl_at = now + timedelta(seconds=crawl_state.min_interval)
+        crawl_state.save(update_fields=['next_crawl_at'])
+        ptt_scrape.delay(crawl_state.board.name)
+
+
+def get_crawl_interval(crawl_state: BoardCrawlState) -> int:
+    # 依觀察到的發文速度，讓每次爬取約有 crawl_target_articles 篇新文章
+    if crawl_state.posts_per_hour <= 0:
+        return crawl_state.max_interval
+    interval = settings.crawl_target_articles / crawl_state.posts_per_hour * 3600
+    return int(min(max(interval, crawl_state.min_interval), crawl_state.max_interval))
 
 
 def get_html(url: str) -> str:
-    session = requests.Session()
-    payload = {
-        "from": url,
-        "yes": "yes"
-    }
-    session.post("https://www.ptt.cc/ask/over18", data=payload)
-    response = session.get(url)
-    return response.text
+    return get_fetcher().get(url)
 
 
 def get_urls_from_board_html(html: str, board: str) -> list:
-    html_soup = BeautifulSoup(html, 'html.parser')
-    r_ent_all = html_soup.find_all('div', class_='r-ent')
-    urls = []
-    for r_ent in r_ent_all:
-        # 若無r_ent.find('a')['href']代表文章已刪除
-        if r_ent.find('a'):
-            if r_ent.find('a')['href']:
-                urls.append('https://www.ptt.cc' + r_ent.find('a')['href'])
-    return urls
+    return parsers.get_urls_from_board_html(html, backend=settings.html_parser_backend)
+
+
+def get_prev_index_page(html: str):
+    return parsers.get_prev_index_page(html, backend=settings.html_parser_backend)
+
+
+def get_url_timestamp(url: str) -> int:
+    # PTT 文章網址格式為 M.<發文時間戳>.A.<亂數>.html
+    match = re.search(r'/M\.(\d+)\.', url)
+    return int(match.group(1)) if match else 0
+
+
+def get_new_urls_from_board(board: str) -> tuple:
+    """從最新一頁往回讀到上次的進度，回傳 (新文章網址, 最新頁碼, 最新文章網址)。"""
+    board_url = f'https://www.ptt.cc/bbs/{board}/'
+    board_obj, _ = Board.objects.get_or_create(name=board)
+    crawl_state, _ = BoardCrawlState.objects.get_or_create(board=board_obj)
+    newest_html = get_html(board_url + 'index.html')
+    prev_page = get_prev_index_page(newest_html)
+    newest_page = prev_page + 1 if prev_page else 1
+    if crawl_state.last_index_page is None:
+        # 第一次爬取的看板只回補有限頁數
+        stop_page = max(1, newest_page - settings.scrape_backfill_pages + 1)
+    else:
+        stop_page = max(1, crawl_state.last_index_page, newest_page - settings.scrape_max_pages + 1)
+        if crawl_state.last_index_page < stop_page:
+            Log.objects.create(level='INFO', type=f'scrape-{board}',
+                               message=f'{board} 新頁數超過上限，略過第 {crawl_state.last_index_page} 到 {stop_page - 1} 頁')
+    page_numbers = {f'{board_url}index{page}.html': page for page in range(stop_page, newest_page)}
+    page_urls = {newest_page: get_urls_from_board_html(newest_html, board)}
+    failed_pages = []
+    for page_url, page_html, fetch_error in get_fetcher().fetch_many(list(page_numbers)):
+        if fetch_error:
+            Log.objects.create(level='ERROR', type=f'scrape-{board}', message=f'{page_url}取得HTML失敗: {fetch_error}')
+            failed_pages.append(page_numbers[page_url])
+            continue
+        page_urls[page_numbers[page_url]] = get_urls_from_board_html(page_html, board)
+    urls = [url for page in sorted(page_urls) for url in page_urls[page]]
+    watermark = get_url_timestamp(crawl_state.last_article_url) if crawl_state.last_article_url else 0
+    new_urls = []
+    seen_urls = set()
+    for url in urls:
+        if get_url_timestamp(url) >= watermark and url not in seen_urls:
+            seen_urls.add(url)
+            new_urls.append(url)
+    if failed_pages:
+        # 進度只推進到第一個失敗的頁面之前，下次從該頁重新讀取
+        resume_page = min(failed_pages)
+        cursor_urls = [url for page in sorted(page_urls) if page < resume_page for url in page_urls[page]]
+        newest_url = max(cursor_urls, key=get_url_timestamp, default=crawl_state.last_article_url)
+        return new_urls, resume_page, newest_url
+    newest_url = max(urls, key=get_url_timestamp, default=crawl_state.last_article_url)
+    return new_urls, newest_page, newest_url
+
+
+def add_failed_urls(board: str, urls: list):
+    # 重試仍抓取失敗的文章留到下次爬取看板時再試
+    with transaction.atomic():
+        crawl_state = BoardCrawlState.objects.select_for_update().get(board__name=board)
+        for url in urls:
+            crawl_state.failed_urls[url] = crawl_state.failed_urls.get(url, 0) + 1
+        crawl_state.save(update_fields=['failed_urls'])
+
+
+def pop_retry_urls(board: str) -> list:
+    """回傳上次抓取失敗、仍需重試的文章網址；已存入或超過重試次數的網址自清單移除。"""
+    with transaction.atomic():
+        crawl_state = BoardCrawlState.objects.select_for_update().get(board__name=board)
+        if not crawl_state.failed_urls:
+            return []
+        unseen_urls = set(get_unseen_urls(list(crawl_state.failed_urls)))
+        expired_urls = [url for url in unseen_urls if crawl_state.failed_urls[url] > settings.scrape_max_retries]
+        for url in expired_urls:
+            Log.objects.create(level='ERROR', type=f'scrape-{board}', message=f'{url}多次爬取仍失敗，不再重試')
+        crawl_state.failed_urls = {url: count for url, count in crawl_state.failed_urls.items()
+                                   if url in unseen_urls and url not in expired_urls}
+        crawl_state.save(update_fields=['failed_urls'])
+        return list(crawl_state.failed_urls)
+
+
+def save_board_crawl_state(board: str, index_page: int, article_url: str, new_article_count: int):
+    crawl_state = BoardCrawlState.objects.get(board__name=board)
+    now = timezone.now()
+    # 第一次爬取還沒有發文速度，以最短間隔再爬一次來測量
+    measured = crawl_state.last_crawled_at is not None
+    if measured:
+        hours = max((now - crawl_state.last_crawled_at).total_seconds() / 3600, 1 / 60)
+        posts_per_hour = new_article_count / hours
+        if crawl_state.posts_per_hour > 0:
+            posts_per_hour = 0.5 * posts_per_hour + 0.5 * crawl_state.posts_per_hour
+        crawl_state.posts_per_hour = posts_per_hour
+    crawl_state.last_index_page = index_page
+    crawl_state.last_article_url = article_url
+    crawl_state.last_crawled_at = now
+    interval = get_crawl_interval(crawl_state) if measured else crawl_state.min_interval
+    crawl_state.next_crawl_at = now + timedelta(seconds=interval)
+    crawl_state.save()
+
+
+def get_unseen_urls(urls: list) -> list:
+    seen_urls = set(Article.objects.filter(url__in=urls).values_list('url', flat=True))
+    # 已封存的文章不重新爬取
+    seen_urls.update(ArchivedArticle.objects.filter(url__in=urls).values_list('url', flat=True))
+    return [url for url in urls if url not in seen_urls]
 
 
 def get_data_from_article_html(html: str, board: str) -> dict:
-    html_soup = BeautifulSoup(html, 'html.parser')
-    article_soup = html_soup.find('div', class_='bbs-screen bbs-content')
-    title = article_soup.find_all('span', class_='article-meta-value')[2].text
-    author = article_soup.find_all('span', class_='article-meta-value')[0].text.strip(')').split(' (')[0]
-    time_str = article_soup.find_all('span', class_='article-meta-value')[3].text
-    dt = datetime.strptime(time_str, "%a %b %d %H:%M:%S %Y")
-    dt = dt.replace(tzinfo=ZoneInfo("Asia/Taipei"))
-    post_time = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-    result = []
-    for element in article_soup.children:
-        if element.name not in ["div", "span"]:
-            text = element.get_text(strip=True) if element.name == "a" else str(element).strip()
-            if text:
-                result.append(text)
-    content = "\n".join(result).strip('-')
-
-    data = {
-        'board': board,
-        'title': title,
-        'author': author,
-        'post_time': post_time,
-        'content': content,
-    }
-    return data
-
-
-def get_data_from_article_html_with_llm(html: str) -> dict:
-    query = f"""
-        以下是 HTML 內容，請幫我提取以下欄位：
-        - 看板 (board)
-        - 標題 (title)
-        - 作者 (author)
-        - 時間 (post_time)
-        - 內容 (content)
-
-        HTML 內容：
-        ```
-        {html}
-        ```
-
-        回傳格式為 JSON，例如：
-        {{
-            "board": "example_board",
-            "title": "example_title",
-            "author": "example_author",
-            "post_time": "example_time",
-            "content": "example_content"
-        }}
-        """
-    model = ChatOpenAI(model="gpt-4o", temperature=0, api_key=settings.openai_api_key)
-    parser = JsonOutputParser()
-    prompt = PromptTemplate(
-        template="Answer the user query.\n{format_instructions}\n{query}\n",
-        input_variables=["query"],
-        partial_variables={"format_instructions": parser.get_format_instructions()},
-    )
-    chain_result = prompt | model | parser
-    data = chain_result.invoke({"query": query})
-    data['author'] = data['author'].strip(')').split(' (')[0]
-    return data
+    return parsers.get_data_from_article_html(html, board, backend=settings.html_parser_backend)
+
+
+# 看板、作者名稱對應 id 的行程內快取
+_board_id_cache = {}
+_author_id_cache = {}
+
+
+def get_name_ids(model, cache: dict, names: set) -> dict:
+    missing_names = {name for name in names if name not in cache}
+    if missing_names:
+        cache.update(model.objects.filter(name__in=missing_names).values_list('name', 'id'))
+        unseen_names = missing_names - cache.keys()
+        if unseen_names:
+            model.objects.bulk_create([model(name=name) for name in unseen_names], ignore_conflicts=True)
+            cache.update(model.objects.filter(name__in=unseen_names).values_list('name', 'id'))
+        # MariaDB 預設定序不分大小寫，查到的可能是大小寫不同的既有名稱，這些名稱與 get_or_create 一樣對應到該筆資料
+        for name in missing_names - cache.keys():
+            cache[name] = model.objects.get_or_create(name=name)[0].id
+    return {name: cache[name] for name in names}
+
+
+def get_board_ids(names: set) -> dict:
+    return get_name_ids(Board, _board_id_cache, names)
+
+
+def get_author_ids(names: set) -> dict:
+    return get_name_ids(Author, _author_id_cache, names)
+
+
+def save_article(board: str, article_data: dict):
+    try:
+        board_obj, _ = Board.objects.get_or_create(name=article_data['board'])
+        author_obj, _ = Author.objects.get_or_create(name=article_data['author'])
+        article = Article.objects.create(
+            board=board_obj,
+            title=article_data['title'],
+            author=author_obj,
+            content=article_data['content'],
+            post_time=article_data['post_time'],
+            url=article_data['url'],
+            raw_html_id=article_data.get('raw_html_id')
+        )
+        return article.id
+    except IntegrityError:
+        # 同時執行的另一個爬蟲已存入相同網址
+        Log.objects.create(level='INFO', type=f'scrape-{board}', message=f'文章已存在,url:{article_data["url"]}')
+    except Exception as e:
+        Log.objects.create(level='ERROR', type=f'scrape-{board}',
+                           message=f'{article_data["url"]}Data插入資料庫錯誤: {e}',
+                           traceback=traceback.format_exc())
+    return None
+
+
+def save_unparsed_article(board: str, url: str, raw_html_id: str, error: str):
+    board_obj, _ = Board.objects.get_or_create(name=board)
+    UnparsedArticle.objects.update_or_create(url=url, defaults={
+        'board': board_obj, 'raw_html_id': raw_html_id, 'error': error})
+
+
+def save_articles(board: str, article_data_list: list) -> list:
+    """以單一交易批次寫入文章並回傳新文章 id，失敗時改為逐篇寫入以記錄個別錯誤。"""
+    if not article_data_list:
+        return []
+    try:
+        with transaction.atomic():
+            board_ids = get_board_ids({data['board'] for data in article_data_list})
+            author_ids = get_author_ids({data['author'] for data in article_data_list})
+            urls = [data['url'] for data in article_data_list]
+            existing_urls = set(Article.objects.filter(url__in=urls).values_list('url', flat=True))
+            new_article_data_list = [data for data in article_data_list if data['url'] not in existing_urls]
+            Article.objects.bulk_create([
+                Article(
+                    board_id=board_ids[data['board']],
+                    title=data['title'],
+                    author_id=author_ids[data['author']],
+                    content=data['content'],
+                    post_time=data['post_time'],
+                    url=data['url'],
+                    raw_html_id=data.get('raw_html_id')
+                )
+                for data in new_article_data_list
+            ], ignore_conflicts=True)
+            new_urls = [url for url in urls if url not in existing_urls]
+            return list(Article.objects.filter(url__in=new_urls).order_by('id').values_list('id', flat=True))
+    except Exception as e:
+        # 交易已回滾，快取中可能有不存在的 id
+        _board_id_cache.clear()
+        _author_id_cache.clear()
+        Log.objects.create(level='ERROR', type=f'scrape-{board}', message=f'批次寫入資料庫失敗，改為逐篇寫入: {e}',
+                           traceback=traceback.format_exc())
+    article_id_list = []
+    for article_data in article_data_list:
+        article_id = save_article(board, article_data)
+        if article_id:
+            article_id_list.append(article_id)
+    return article_id_list
 
 
 @app.task()
-def ptt_scrape(board: str) -> list:
+def ptt_scrape(board: str) -> int:
+    """找出看板的新文章後，拆成小批次分派給 scrape_articles，每批完成後立即存入向量資料庫。"""
     Log.objects.create(level='INFO', type=f'scrape-{board}', message=f'開始爬取 {board}')
-    board_url = 'https://www.ptt.cc/bbs/' + board + '/index.html'
-    board_html = get_html(board_url)
-    article_urls = get_urls_from_board_html(board_html, board)
+    article_urls, newest_page, newest_url = get_new_urls_from_board(board)
+    new_article_urls = get_unseen_urls(list(dict.fromkeys(article_urls + pop_retry_urls(board))))
+    save_board_crawl_state(board, newest_page, newest_url, len(new_article_urls))
+    batch_size = settings.scrape_task_batch_size
+    url_batches = [new_article_urls[i:i + batch_size] for i in range(0, len(new_article_urls), batch_size)]
+    if url_batches:
+        # 有批次最終失敗時 chord 不會執行 finish_ptt_scrape，改由 fail_ptt_scrape 記錄結果
+        callback = finish_ptt_scrape.si(board, len(new_article_urls))
+        callback.link_error(fail_ptt_scrape.s(board, len(new_article_urls)))
+        chord([
+            chain(scrape_articles.s(board, url_batch), store_data_in_pinecone.s()) for url_batch in url_batches
+        ])(callback)
+    else:
+        finish_ptt_scrape.delay(board, 0)
+    return len(new_article_urls)
+
+
+@app.task()
+def finish_ptt_scrape(board: str, article_count: int):
+    Log.objects.create(level='INFO', type=f'scrape-{board}', message=f'爬取 {board} 完成，共 {article_count} 篇新文章')
+
+
+@app.task()
+def fail_ptt_scrape(request, exc, tb, board: str, article_count: int):
+    # Celery 呼叫 errback 時會在參數前加上失敗任務的 request、例外與 traceback
+    Log.objects.create(level='ERROR', type=f'scrape-{board}',
+                       message=f'爬取 {board} 結束，{article_count} 篇新文章中有批次處理失敗: {exc}')
+
+
+@app.task()
+def scrape_articles(board: str, article_urls: list, retries: int = 0) -> list:
+    """抓取、解析並存入一小批文章，回傳新文章 id。
+
+    抓取失敗的文章會各自延後重試；其他錯誤時整批文章留到下次爬取看板時重試，已存入的文章屆時會略過。
+    """
+    try:
+        return scrape_article_batch(board, article_urls, retries)
+    except Exception:
+        add_failed_urls(board, article_urls)
+        raise
+
+
+def scrape_article_batch(board: str, article_urls: list, retries: int) -> list:
     article_id_list = []
-    for article_url in article_urls:
-        if Article.objects.filter(url=article_url).exists():
+    pending_articles = []
+    fetched_articles = []
+    parsed_articles = []
+    llm_pending = []
+    for article_url, article_html, fetch_error in get_fetcher().fetch_many(get_unseen_urls(article_urls)):
+        if fetch_error:
+            Log.objects.create(level='ERROR', type=f'scrape-{board}', message=f'{article_url}取得HTML失敗: {fetch_error}')
+            if retries < settings.scrape_max_retries:
+                chain(scrape_articles.s(board, [article_url], retries=retries + 1),
+                      store_data_in_pinecone.s()).apply_async(countdown=settings.scrape_retry_delay * 2 ** retries)
+            else:
+                add_failed_urls(board, [article_url])
             continue
-        article_html = get_html(article_url)
+        fetched_articles.append((article_url, article_html))
+    # 解析前先封存 HTML，解析失敗的文章在修正解析器後仍可重新解析
+    raw_html_ids = dict(zip([article_url for article_url, _ in fetched_articles],
+                            archive_html_list([article_html for _, article_html in fetched_articles])))
+    for article_url, article_html in fetched_articles:
         try:
-            article_data = get_data_from_article_html(article_html, board)
+            parsed_articles.append((article_url, get_data_from_article_html(article_html, board)))
         except Exception as e:
             Log.objects.create(level='ERROR', type=f'scrape-{board}', message=f'從url:{article_url}取得data失敗，使用LLM處理: {e}',
                                traceback=traceback.format_exc())
-            article_data = None
-        if not article_data:
-            try:
-                article_data = get_data_from_article_html_with_llm(article_html)
-            except Exception as e:
-                Log.objects.create(level='ERROR', type=f'scrape-{board}', message=f'{article_url}LLM處理失敗: {e}',
-                                   traceback=traceback.format_exc())
+            llm_pending.append((article_url, article_html))
+    if llm_pending:
+        llm_results = extract_articles_with_llm([article_html for _, article_html in llm_pending])
+        for (article_url, _), article_data in zip(llm_pending, llm_results):
+            if isinstance(article_data, Exception):
+                Log.objects.create(level='ERROR', type=f'scrape-{board}', message=f'{article_url}LLM處理失敗: {article_data}',
+                                   traceback=''.join(traceback.format_exception(article_data)))
+                save_unparsed_article(board, article_url, raw_html_ids[article_url], str(article_data))
                 continue
+            parsed_articles.append((article_url, article_data))
+    for article_url, article_data in parsed_articles:
         try:
-            board_obj, _ = Board.objects.get_or_create(name=article_data['board'])
-            author_obj, _ = Author.objects.get_or_create(name=article_data['author'])
-            if len(article_data['content'])<=30000:
-                article = Article.objects.create(
-                    board=board_obj,
-                    title=article_data['title'],
-                    author=author_obj,
-                    content=article_data['content'],
-                    post_time=article_data['post_time'],
-                    url=article_url
-                )
-            else:
+            if len(article_data['content']) > 30000:
                 Log.objects.create(level='INFO', type=f'scrape-{board}',
                                    message=f'文章內容過長,url:{article_url}')
                 continue
-            article_id_list.append(article.id)
+            article_data['url'] = article_url
+            article_data['raw_html_id'] = raw_html_ids[article_url]
+            pending_articles.append(article_data)
         except Exception as e:
             Log.objects.create(level='ERROR', type=f'scrape-{board}', message=f'{article_url}Data插入資料庫錯誤: {e}',
                                traceback=traceback.format_exc())
-    Log.objects.create(level='INFO', type=f'scrape-{board}', message=f'爬取 {board} 完成')
-    return article_id_list
\ No newline at end of file
+            continue
+        if len(pending_articles) >= settings.scrape_batch_size:
+            article_id_list.extend(save_articles(board, pending_articles))
+            pending_articles = []
+    article_id_list.extend(save_articles(board, pending_articles))
+    return article_id_list
@@ -1,9 +1,19 @@
+from pydantic import BaseModel, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from ptt_rag import settings as ptt_rag_settings
+from rag_app.chunker import TEXT_SEPARATORS
 
 BASE_DIR = ptt_rag_settings.BASE_DIR
 
 
+class IndexProfile(BaseModel):
+    # index_name 留空代表使用 pinecone_index_name；chunker_backend 為 token 時 chunk_size 與 chunk_overlap 以 token 計算
+    index_name: str = ''
+    chunk_size: int
+    chunk_overlap: int
+    separators: list[str] = TEXT_SEPARATORS
+
+
 class Settings(BaseSettings):
     pinecone_api_key: str = None
     openai_api_key: str = None
@@ -12,8 +22,79 @@ class Settings(BaseSettings):
     mysql_user: str = None
     mysql_password: str = None
     mysql_root_password: str = None
+    scrape_max_workers: int = 8
+    scrape_per_host_limit: int = 4
+    scrape_delay: float = 0.1
+    scrape_timeout: float = 10
+    scrape_max_pages: int = 50
+    scrape_backfill_pages: int = 3
+    scrape_batch_size: int = 50
+    scrape_task_batch_size: int = 5
+    scrape_max_retries: int = 3
+    scrape_retry_delay: int = 60
+    crawl_target_articles: int = 10
+    index_profiles: list[IndexProfile] = [
+        IndexProfile(chunk_size=100, chunk_overlap=20),
+        IndexProfile(index_name='ptt100', chunk_size=100, chunk_overlap=20),
+        IndexProfile(index_name='ptt300', chunk_size=300, chunk_overlap=60),
+        IndexProfile(index_name='ptt500', chunk_size=500, chunk_overlap=100),
+    ]
+    # token（rag_app.chunker）或 langchain（以字數切段的 RecursiveCharacterTextSplitter）
+    chunker_backend: str = 'token'
+    index_article_batch_size: int = 100
+    embed_batch_size: int = 256
+    upsert_batch_size: int = 100
+    embed_concurrency: int = 4
+    upsert_concurrency: int = 4
+    index_max_pending: int = 8
+    index_max_attempts: int = 5
+    index_retry_base_delay: float = 1
+    embedding_backend: str = 'openai'
+    embedding_model: str = 'text-embedding-ada-002'
+    embedding_dimension: int = 1536
+    embedding_cache_path: str = str(BASE_DIR / 'embedding_cache.sqlite3')
+    embedding_cache_max_entries: int = 1000000
+    # pinecone 或 local（本機 memory-mapped 索引）
+    vector_backend: str = 'pinecone'
+    local_index_dir: str = str(BASE_DIR / 'vector_index')
+    local_index_nprobe: int = 8
+    retention_batch_size: int = 500
+    query_embedding_cache_size: int = 1024
+    query_embedding_cache_ttl: int = 60 * 60
+    vector_pool_maxsize: int = 10
+    answer_cache_timeout: int = 60 * 60 * 24
+    # 設定後，問題嵌入的 cosine 相似度達門檻也視為命中（例如 0.95）
+    answer_cache_similarity_threshold: float | None = None
+    answer_cache_semantic_entries: int = 200
+    # /api/search/ 查詢的索引；此索引的段落同時寫入本機關鍵字索引，查詢時以 reciprocal rank fusion 合併
+    search_index_name: str = 'ptt300'
+    lexical_search: bool = True
+    lexical_index_dir: str = str(BASE_DIR / 'lexical_index')
+    hybrid_candidate_count: int = 20
+    rrf_k: int = 60
+    batch_search_max_queries: int = 50
+    # 向量查詢多取 top_k * mmr_fetch_multiplier 個候選段落，以 MMR 重新排序並略過重複段落；
+    # max_chunks_per_article 為每篇文章最多選入的段落數，設為 0 不限制
+    mmr_enabled: bool = True
+    mmr_lambda: float = 0.5
+    mmr_fetch_multiplier: int = 4
+    mmr_duplicate_threshold: float | None = 0.97
+    max_chunks_per_article: int | None = 2
+    # 提示詞中文章段落的 token 上限，以及每個命中段落前後各補上幾個相鄰段落
+    context_token_budget: int = 6000
+    context_neighbor_chunks: int = 1
+    html_parser_backend: str = 'lxml'
+    llm_max_concurrency: int = 4
+    llm_cache_timeout: int = 60 * 60 * 24 * 30
 
     model_config = SettingsConfigDict(env_file=BASE_DIR / ".env")
 
+    @model_validator(mode='after')
+    def fill_default_index_name(self):
+        for profile in self.index_profiles:
+            if not profile.index_name:
+                profile.index_name = self.pinecone_index_name
+        return self
+
 
 settings = Settings()
\ No newline at end of file
@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.schedules import crontab
 import os
 import django
 
@@ -11,12 +12,19 @@ app.autodiscover_tasks()
 app.conf.imports = [
     "celery_app.data_processing",
     "celery_app.scraper",
+    "celery_app.retention",
 ]
 
 app.conf.beat_schedule = {
-    'scrape-every-hour': {
+    # 每分鐘檢查一次，各看板的實際爬取間隔由 BoardCrawlState 決定
+    'dispatch-due-board-crawls': {
         'task': 'celery_app.scraper.period_send_ptt_scrape_task',
-        'schedule': 3600,
-    }
+        'schedule': 60,
+    },
+    # 每天清除超過保留天數的向量與文章，保留天數由 BoardCrawlState 設定
+    'apply-retention-policies': {
+        'task': 'celery_app.retention.apply_retention_policies',
+        'schedule': crontab(hour=4, minute=0),
+    },
 }
 
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 
 from drf_spectacular.utils import extend_schema_view, extend_schema
@@ -12,4 +13,6 @@ urlpatterns = [
     path('api/schema/', CustomSpectacularAPIView.as_view(), name='schema'),
     path('api/schema/doc/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
-]
\ No newline at end of file
+]
+# uvicorn 不像 runserver 會自動提供靜態檔案（僅 DEBUG 時生效）
+urlpatterns += staticfiles_urlpatterns()
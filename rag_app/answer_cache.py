@@ -0,0 +1,81 @@
+import hashlib
+import json
+import time
+
+import numpy as np
+from django.core.cache import cache
+
+from env_settings import settings
+from rag_app.embeddings import normalize_question
+
+ANSWER_CACHE_PREFIX = 'answer-cache'
+VERSION_KEY = f'{ANSWER_CACHE_PREFIX}:version'
+
+_stats = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0}
+
+
+def get_answer_cache_version() -> int:
+    return cache.get_or_set(VERSION_KEY, 0, timeout=None)
+
+
+def bump_answer_cache_version():
+    """索引內容變更後呼叫，舊版本的快取不再被讀取，並在逾時後自動清除。"""
+    cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def get_scope(top_k: int, search_filter: dict = None) -> str:
+    # 不同的過濾條件各自快取
+    if not search_filter:
+        return str(top_k)
+    return f'{top_k}:{hashlib.sha256(json.dumps(search_filter, sort_keys=True).encode()).hexdigest()[:16]}'
+
+
+def get_answer_key(version: int, question: str, top_k: int, search_filter: dict = None) -> str:
+    question_hash = hashlib.sha256(normalize_question(question).encode()).hexdigest()
+    return f'{ANSWER_CACHE_PREFIX}:{version}:{get_scope(top_k, search_filter)}:{question_hash}'
+
+
+def get_semantic_key(version: int, top_k: int, search_filter: dict = None) -> str:
+    return f'{ANSWER_CACHE_PREFIX}:{version}:{get_scope(top_k, search_filter)}:semantic'
+
+
+def get_cached_answer(question: str, top_k: int, embedding: list = None, search_filter: dict = None):
+    """先以正規化後的問題比對，未命中且有設定相似度門檻時，再比對最近快取問題的嵌入。"""
+    version = get_answer_cache_version()
+    answer = cache.get(get_answer_key(version, question, top_k, search_filter))
+    if answer is not None:
+        _stats['exact_hits'] += 1
+        return answer
+    threshold = settings.answer_cache_similarity_threshold
+    if threshold is not None and embedding is not None:
+        entries = cache.get(get_semantic_key(version, top_k, search_filter)) or []
+        if entries:
+            vectors = np.frombuffer(b''.join(vector for vector, _ in entries), dtype=np.float32).reshape(len(entries), -1)
+            query = np.asarray(embedding, dtype=np.float32)
+            scores = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query) + 1e-12)
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold:
+                answer = cache.get(entries[best][1])
+                if answer is not None:
+                    _stats['semantic_hits'] += 1
+                    return answer
+    _stats['misses'] += 1
+    return None
+
+
+def set_cached_answer(question: str, top_k: int, answer: dict, embedding: list = None,
+                      search_filter: dict = None):
+    version = get_answer_cache_version()
+    answer_key = get_answer_key(version, question, top_k, search_filter)
+    cache.set(answer_key, answer, timeout=settings.answer_cache_timeout)
+    if settings.answer_cache_similarity_threshold is not None and embedding is not None:
+        semantic_key = get_semantic_key(version, top_k, search_filter)
+        entries = [entry for entry in cache.get(semantic_key) or [] if entry[1] != answer_key]
+        entries.append((np.asarray(embedding, dtype=np.float32).tobytes(), answer_key))
+        cache.set(semantic_key, entries[-settings.answer_cache_semantic_entries:], timeout=settings.answer_cache_timeout)
+
+
+def get_answer_cache_stats() -> dict:
+    total = sum(_stats.values())
+    hits = _stats['exact_hits'] + _stats['semantic_hits']
+    return {**_stats, 'hit_rate': hits / total if total else 0.0}
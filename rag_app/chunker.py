@@ -0,0 +1,98 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import tiktoken
+
+# PTT 文章的分隔符號，越前面越優先切開
+TEXT_SEPARATORS = ["\n\n", "\n---\n", "\n--\n", "\n", "。", "！", "？", "，", " ", ""]
+
+
+@lru_cache
+def get_encoding(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
+
+
+class TokenChunker:
+    """以 token 數切段的分段器，分隔符號與 RecursiveCharacterTextSplitter 相同。
+
+    文字只掃描一次：先依分隔符號切成小片段並計算各片段的 token 數，各組 (chunk_size, chunk_overlap)
+    再以同一份片段決定切點。超出長度時，優先在較前面（較強）的分隔符號處切開。
+    """
+
+    def __init__(self, separators: list, encoding: tiktoken.Encoding):
+        self.separators = [separator for separator in separators if separator]
+        self.encoding = encoding
+        pattern = '|'.join(re.escape(separator) for separator in sorted(self.separators, key=len, reverse=True))
+        self.pattern = re.compile(f'({pattern})') if pattern else None
+        self.levels = {separator: level for level, separator in enumerate(self.separators)}
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+    def segment(self, text: str, max_tokens: int) -> tuple:
+        """回傳 (片段, 各片段結尾的分隔符號強度, 各片段 token 數)，片段不超過 max_tokens。"""
+        parts = self.pattern.split(text) if self.pattern else [text]
+        no_separator = len(self.separators)
+        segments = []
+        levels = []
+        tokens = []
+        # re.split 的結果為 文字, 分隔符號, 文字, 分隔符號, ...，分隔符號接在前一段的結尾
+        for i in range(0, len(parts), 2):
+            separator = parts[i + 1] if i + 1 < len(parts) else ''
+            segment = parts[i] + separator
+            if not segment:
+                continue
+            level = self.levels.get(separator, no_separator)
+            count = self.count_tokens(segment)
+            if count <= max_tokens:
+                segments.append(segment)
+                levels.append(level)
+                tokens.append(count)
+                continue
+            # 沒有分隔符號可切的長片段依字數比例切開
+            step = max(1, len(segment) * max_tokens // count)
+            pieces = [segment[j:j + step] for j in range(0, len(segment), step)]
+            segments.extend(pieces)
+            levels.extend([no_separator] * (len(pieces) - 1) + [level])
+            tokens.extend(self.count_tokens(piece) for piece in pieces)
+        return segments, np.array(levels, dtype=np.int32), np.array(tokens, dtype=np.int64)
+
+    def split(self, text: str, sizes: list) -> list:
+        """sizes 為 [(chunk_size, chunk_overlap)]，回傳與 sizes 對應的段落列表。"""
+        if not sizes:
+            return []
+        segments, levels, tokens = self.segment(text, min(chunk_size for chunk_size, _ in sizes))
+        offsets = np.concatenate([[0], np.cumsum(tokens)])
+        return [self._pack(segments, levels, offsets, chunk_size, chunk_overlap) for chunk_size, chunk_overlap in sizes]
+
+    @staticmethod
+    def _pack(segments: list, levels: np.ndarray, offsets: np.ndarray, chunk_size: int, chunk_overlap: int) -> list:
+        count = len(segments)
+        chunks = []
+        start = 0
+        while start < count:
+            limit = max(int(np.searchsorted(offsets, offsets[start] + chunk_size, side='right')) - 1, start + 1)
+            if limit >= count:
+                end = count
+            else:
+                # 至少填滿一半後，在最強的分隔符號處切開，同強度取最後一個
+                lowest = min(max(int(np.searchsorted(offsets, offsets[start] + chunk_size / 2)), start + 1), limit)
+                candidates = levels[lowest - 1:limit]
+                end = limit - int(np.argmin(candidates[::-1]))
+            chunk = ''.join(segments[start:end]).strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= count:
+                break
+            overlap_start = int(np.searchsorted(offsets, offsets[end] - chunk_overlap))
+            start = min(max(overlap_start, start + 1), end)
+        return chunks
+
+
+@lru_cache
+def get_chunker(separators: tuple, model: str) -> TokenChunker:
+    return TokenChunker(list(separators), get_encoding(model))
@@ -0,0 +1,108 @@
+from dataclasses import dataclass, field
+
+from env_settings import settings
+from rag_app.chunker import get_encoding
+from rag_app.llm import CHAT_MODEL
+from rag_app.vector_stores import fetch_metadata, get_vector_id
+
+
+@dataclass
+class RankedChunk:
+    article_id: int
+    chunk_index: int
+    title: str
+    text: str
+    score: float
+
+
+@dataclass
+class Context:
+    text: str
+    article_ids: list = field(default_factory=list)
+    token_count: int = 0
+    chunk_count: int = 0
+
+
+def rank_chunks(results: list) -> list:
+    """將查詢結果 [(Document, 分數)] 依分數排序，同一段落只保留一次。"""
+    chunks = {}
+    for document, score in results:
+        # Pinecone 回傳的數字 metadata 為 float
+        key = (int(document.metadata['article_id']), int(document.metadata['chunk_index']))
+        if key not in chunks or score > chunks[key].score:
+            chunks[key] = RankedChunk(*key, document.metadata.get('title', ''), document.page_content, score)
+    return sorted(chunks.values(), key=lambda chunk: chunk.score, reverse=True)
+
+
+def fetch_neighbor_chunks(index, index_name: str, chunks: list, window: int) -> dict:
+    """以確定性的向量 id 取回命中段落前後 window 個段落，回傳 {(文章 id, 段落編號): 段落文字}。"""
+    known = {(chunk.article_id, chunk.chunk_index) for chunk in chunks}
+    wanted = {}
+    for chunk in chunks:
+        for distance in range(1, window + 1):
+            for chunk_index in (chunk.chunk_index - distance, chunk.chunk_index + distance):
+                if chunk_index >= 0 and (chunk.article_id, chunk_index) not in known:
+                    wanted[get_vector_id(chunk.article_id, index_name, chunk_index)] = (chunk.article_id, chunk_index)
+    if not wanted:
+        return {}
+    metadata = fetch_metadata(index, list(wanted))
+    return {wanted[vector_id]: values['text'] for vector_id, values in metadata.items() if 'text' in values}
+
+
+def join_overlapping(texts: list) -> str:
+    """連續段落切段時有重疊，接起來前去掉與前一段結尾重複的開頭。"""
+    merged = texts[0]
+    for text in texts[1:]:
+        overlap = next((size for size in range(min(len(merged), len(text)), 0, -1) if merged.endswith(text[:size])), 0)
+        merged += text[overlap:]
+    return merged
+
+
+def render_article(title: str, chunks: dict) -> str:
+    runs = []
+    previous = None
+    for chunk_index in sorted(chunks):
+        if previous is not None and chunk_index == previous + 1:
+            runs[-1].append(chunks[chunk_index])
+        else:
+            runs.append([chunks[chunk_index]])
+        previous = chunk_index
+    return f"Title:{title} - Content:" + "\n...\n".join(join_overlapping(run) for run in runs)
+
+
+def build_context(results: list, index, index_name: str, token_budget: int = None,
+                  neighbor_chunks: int = None) -> Context:
+    """依分數由高到低放入命中段落，再依序補上從 index 取回的相鄰段落，直到 token 預算用完；同一篇文章合併成一段。"""
+    token_budget = settings.context_token_budget if token_budget is None else token_budget
+    neighbor_chunks = settings.context_neighbor_chunks if neighbor_chunks is None else neighbor_chunks
+    encoding = get_encoding(CHAT_MODEL)
+    ranked = rank_chunks(results)
+    neighbors = fetch_neighbor_chunks(index, index_name, ranked, neighbor_chunks) if neighbor_chunks > 0 else {}
+
+    candidates = [(chunk.article_id, chunk.chunk_index, chunk.text) for chunk in ranked]
+    for distance in range(1, neighbor_chunks + 1):
+        for chunk in ranked:
+            for chunk_index in (chunk.chunk_index - distance, chunk.chunk_index + distance):
+                if (chunk.article_id, chunk_index) in neighbors:
+                    candidates.append((chunk.article_id, chunk_index, neighbors[chunk.article_id, chunk_index]))
+
+    titles = {}
+    for chunk in ranked:
+        titles.setdefault(chunk.article_id, chunk.title)
+    selected = {}
+    remaining = token_budget
+    for article_id, chunk_index, text in candidates:
+        if chunk_index in selected.get(article_id, {}):
+            continue
+        cost = len(encoding.encode_ordinary(text))
+        if article_id not in selected:
+            cost += len(encoding.encode_ordinary(f"Title:{titles[article_id]} - Content:\n"))
+        # 放不下的段落略過，後面較短的段落仍可能放得下
+        if cost > remaining:
+            continue
+        remaining -= cost
+        selected.setdefault(article_id, {})[chunk_index] = text
+
+    text = "\n".join(render_article(titles[article_id], chunks) for article_id, chunks in selected.items())
+    return Context(text=text, article_ids=list(selected), token_count=token_budget - remaining,
+                   chunk_count=sum(map(len, selected.values())))
@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from env_settings import settings
+
+
+class SqliteEmbeddingStore:
+    """以 SQLite 檔案保存 float32 向量，超過 max_entries 時淘汰最久未使用的項目。
+
+    讀取時只更新超過 touch_interval 秒未更新的 last_used，查詢為主的讀取不需每次寫入。
+    """
+
+    def __init__(self, path: str, max_entries: int, evict_interval: int = 1000, touch_interval: float = 3600):
+        self.max_entries = max_entries
+        self.evict_interval = evict_interval
+        self.touch_interval = touch_interval
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS embedding '
+                           '(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS embedding_last_used ON embedding (last_used)')
+        self._conn.commit()
+
+    def get_many(self, keys: list) -> dict:
+        found = {}
+        stale_keys = []
+        keys = list(keys)
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                for key, vector, last_used in self._conn.execute(
+                        f'SELECT key, vector, last_used FROM embedding WHERE key IN ({placeholders})', batch):
+                    found[key] = vector
+                    if last_used < now - self.touch_interval:
+                        stale_keys.append(key)
+            if stale_keys:
+                self._conn.executemany('UPDATE embedding SET last_used = ? WHERE key = ?',
+                                       [(now, key) for key in stale_keys])
+                self._conn.commit()
+        return {key: np.frombuffer(vector, dtype=np.float32).tolist() for key, vector in found.items()}
+
+    def set_many(self, items: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO embedding (key, vector, last_used) VALUES (?, ?, ?)',
+                                   [(key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                                    for key, vector in items.items()])
+            self._writes += len(items)
+            if self._writes >= self.evict_interval:
+                self._writes = 0
+                self._conn.execute('DELETE FROM embedding WHERE key IN (SELECT key FROM embedding '
+                                   'ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """以 (模型, sha256(文字)) 快取嵌入結果，寫入與查詢共用同一個介面。"""
+
+    def __init__(self, embeddings: Embeddings, store: SqliteEmbeddingStore, model_name: str):
+        self.embeddings = embeddings
+        self.store = store
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        # IndexPipeline 的多個嵌入執行緒共用同一個實例
+        self._lock = threading.Lock()
+
+    def get_key(self, text: str) -> str:
+        return f'{self.model_name}:{hashlib.sha256(text.encode()).hexdigest()}'
+
+    def embed_documents(self, texts: list) -> list:
+        keys = [self.get_key(text) for text in texts]
+        vectors = self.store.get_many(set(keys))
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing:
+            new_vectors = dict(zip(missing.keys(), self.embeddings.embed_documents(list(missing.values()))))
+            self.store.set_many(new_vectors)
+            vectors.update(new_vectors)
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0}
+
+
+def normalize_question(text: str) -> str:
+    # 全形轉半形、合併空白、英文轉小寫，讓寫法不同的相同問題共用快取
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip().lower()
+
+
+class QueryEmbeddingCache(Embeddings):
+    """查詢問題的行程內 LRU 快取，項目超過 ttl 秒後重新嵌入；文件嵌入直接交給 embeddings。"""
+
+    def __init__(self, embeddings: Embeddings, max_entries: int, ttl: float):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: list) -> list:
+        return self.embeddings.embed_documents(texts)
+
+    def _get_cached(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+
+    def _set_cached(self, key: str, vector: list):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def embed_query(self, text: str) -> list:
+        # 正規化後的問題只作為快取 key，嵌入仍使用原始問題，保留代號、人名的大小寫
+        key = normalize_question(text)
+        vector = self._get_cached(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._set_cached(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> list:
+        # 命中時不切換執行緒；未命中時在執行緒池中使用共用連線池的同步 client
+        key = normalize_question(text)
+        vector = self._get_cached(key)
+        if vector is None:
+            vector = await asyncio.get_running_loop().run_in_executor(None, self.embeddings.embed_query, text)
+            self._set_cached(key, vector)
+        return vector
+
+    def embed_queries(self, texts: list) -> list:
+        """多個問題中未命中快取的問題以一次 embed_documents 請求嵌入。"""
+        keys = [normalize_question(text) for text in texts]
+        # 同一個 key 的問題以第一次出現的原文嵌入
+        key_texts = {}
+        for key, text in zip(keys, texts):
+            key_texts.setdefault(key, text)
+        vectors = {key: self._get_cached(key) for key in key_texts}
+        missing = [key for key, vector in vectors.items() if vector is None]
+        if missing:
+            for key, vector in zip(missing, self.embeddings.embed_documents([key_texts[key] for key in missing])):
+                vectors[key] = vector
+                self._set_cached(key, vector)
+        return [vectors[key] for key in keys]
+
+    async def aembed_queries(self, texts: list) -> list:
+        return await asyncio.get_running_loop().run_in_executor(None, self.embed_queries, texts)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries), 'max_entries': self.max_entries, 'ttl': self.ttl}
+
+
+def get_embedding_backend() -> Embeddings:
+    if settings.embedding_backend == 'fake':
+        # 固定輸出的假向量，供測試與效能評估使用
+        return DeterministicFakeEmbedding(size=settings.embedding_dimension)
+    return OpenAIEmbeddings(model=settings.embedding_model, api_key=settings.openai_api_key)
+
+
+@lru_cache
+def get_embeddings() -> CachedEmbeddings:
+    return CachedEmbeddings(
+        get_embedding_backend(),
+        SqliteEmbeddingStore(settings.embedding_cache_path, settings.embedding_cache_max_entries),
+        model_name=f'{settings.embedding_backend}:{settings.embedding_model}',
+    )
+
+
+@lru_cache
+def get_query_embeddings() -> QueryEmbeddingCache:
+    return QueryEmbeddingCache(get_embeddings(), settings.query_embedding_cache_size, settings.query_embedding_cache_ttl)
@@ -0,0 +1,171 @@
+import json
+import re
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from rag_app.local_store import match_filter
+
+# 中文以相鄰兩字為詞，英文與數字（股票代號等）以整個字為詞
+CJK_RANGES = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+TOKEN_PATTERN = re.compile(f'[{CJK_RANGES}]+|[a-z0-9]+')
+CJK_PATTERN = re.compile(f'[{CJK_RANGES}]')
+
+# 查詢時可直接以 SQL 過濾的 metadata 欄位
+FILTER_COLUMNS = ('board', 'author', 'post_timestamp')
+COMPARISON_OPERATORS = {'$eq': 'IS', '$ne': 'IS NOT', '$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}
+
+
+def tokenize(text: str) -> list:
+    terms = []
+    for run in TOKEN_PATTERN.findall(unicodedata.normalize('NFKC', text).lower()):
+        if CJK_PATTERN.match(run) and len(run) > 1:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return terms
+
+
+def filter_to_sql(metadata_filter: dict):
+    """將 metadata 過濾條件轉成 chunks 欄位的 SQL 條件，回傳 (條件, 參數)；含有其他欄位時回傳 None。"""
+    clauses = []
+    params = []
+    for key, condition in metadata_filter.items():
+        if key in ('$and', '$or'):
+            sub_clauses = [filter_to_sql(sub_filter) for sub_filter in condition]
+            if not sub_clauses or None in sub_clauses:
+                return None
+            clauses.append('(' + f' {key[1:].upper()} '.join(clause for clause, _ in sub_clauses) + ')')
+            params.extend(param for _, sub_params in sub_clauses for param in sub_params)
+            continue
+        if key not in FILTER_COLUMNS:
+            return None
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for operator, operand in condition.items():
+            if operator in COMPARISON_OPERATORS:
+                clauses.append(f'chunks.{key} {COMPARISON_OPERATORS[operator]} ?')
+                params.append(operand)
+            elif operator in ('$in', '$nin'):
+                placeholders = ','.join('?' * len(operand))
+                clauses.append(f'chunks.{key} IN ({placeholders})' if operator == '$in' else
+                               f'(chunks.{key} IS NULL OR chunks.{key} NOT IN ({placeholders}))')
+                params.extend(operand)
+            else:
+                return None
+    return ' AND '.join(clauses) or '1', params
+
+
+class LexicalIndex:
+    """以 SQLite FTS5 建立的段落關鍵字索引，依 BM25 排序，段落先切成中文雙字詞與英數字詞。
+
+    upsert/delete 的參數與向量索引相同，索引 metadata 的 title 與 text；看板、作者與發文時間另存為 chunks 的欄位，
+    查詢時在 SQL 中過濾，不需載入所有命中的段落。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        # 多個執行緒或行程可能同時開啟同一個索引檔，建表與補欄位在同一個寫入交易中完成
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('CREATE TABLE IF NOT EXISTS chunks (row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, '
+                     'metadata TEXT NOT NULL, board TEXT, author TEXT, post_timestamp INTEGER)')
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(chunks)')}
+        if not set(FILTER_COLUMNS) <= columns:
+            # 舊版索引檔沒有過濾欄位，由 metadata 補上
+            for column in FILTER_COLUMNS:
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE chunks ADD COLUMN {column} '
+                                 f'{"INTEGER" if column == "post_timestamp" else "TEXT"}')
+            conn.execute('UPDATE chunks SET ' + ', '.join(f"{column} = json_extract(metadata, '$.{column}')"
+                                                          for column in FILTER_COLUMNS))
+        conn.execute('CREATE INDEX IF NOT EXISTS chunks_board_post_timestamp ON chunks (board, post_timestamp)')
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5(text, tokenize='unicode61')")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def upsert(self, vectors: list, **kwargs):
+        conn = self._conn()
+        with conn:
+            for vector in vectors:
+                if not isinstance(vector, dict):
+                    vector = {'id': vector[0], 'metadata': vector[2] if len(vector) > 2 else {}}
+                vector_id, metadata = vector['id'], vector.get('metadata') or {}
+                values = [json.dumps(metadata, ensure_ascii=False), *(metadata.get(column) for column in FILTER_COLUMNS)]
+                row = conn.execute('SELECT row FROM chunks WHERE id = ?', (vector_id,)).fetchone()
+                if row:
+                    conn.execute('DELETE FROM terms WHERE rowid = ?', row)
+                    conn.execute('UPDATE chunks SET metadata = ?, board = ?, author = ?, post_timestamp = ? '
+                                 'WHERE row = ?', (*values, row[0]))
+                    row = row[0]
+                else:
+                    row = conn.execute('INSERT INTO chunks (id, metadata, board, author, post_timestamp) '
+                                       'VALUES (?, ?, ?, ?, ?)', (vector_id, *values)).lastrowid
+                # 標題一併建立索引，段落內容沒提到的人名、代號也能查到
+                terms = tokenize(f"{metadata.get('title', '')}\n{metadata.get('text', '')}")
+                conn.execute('INSERT INTO terms (rowid, text) VALUES (?, ?)', (row, ' '.join(terms)))
+
+    def delete(self, ids: list = None, delete_all: bool = None, **kwargs):
+        conn = self._conn()
+        with conn:
+            if delete_all:
+                conn.execute('DELETE FROM chunks')
+                conn.execute('DELETE FROM terms')
+                return
+            for vector_id in ids or []:
+                row = conn.execute('SELECT row FROM chunks WHERE id = ?', (vector_id,)).fetchone()
+                if row:
+                    conn.execute('DELETE FROM terms WHERE rowid = ?', row)
+                    conn.execute('DELETE FROM chunks WHERE row = ?', row)
+
+    def search(self, query: str, top_k: int, filter: dict = None, text_key: str = 'text') -> list:
+        """回傳 [(Document, 分數)]，分數為 BM25 取負號，越大越相關。"""
+        terms = dict.fromkeys(tokenize(query))
+        if not terms:
+            return []
+        expression = ' OR '.join(f'"{term}"' for term in terms)
+        filter_sql = filter_to_sql(filter) if filter else ('1', [])
+        sql = ('SELECT chunks.id, chunks.metadata, terms.rank FROM terms JOIN chunks ON chunks.row = terms.rowid '
+               'WHERE terms MATCH ?')
+        if filter_sql is None:
+            # 過濾條件含有其他欄位時，載入命中的段落後逐筆比對
+            cursor = self._conn().execute(f'{sql} ORDER BY terms.rank', (expression,))
+        else:
+            cursor = self._conn().execute(f'{sql} AND {filter_sql[0]} ORDER BY terms.rank LIMIT ?',
+                                          (expression, *filter_sql[1], top_k))
+        results = []
+        for vector_id, metadata, rank in cursor:
+            metadata = json.loads(metadata)
+            if filter_sql is None and not match_filter(metadata, filter):
+                continue
+            text = metadata.pop(text_key, '')
+            results.append((Document(id=vector_id, page_content=text, metadata=metadata), -rank))
+            if len(results) >= top_k:
+                break
+        cursor.close()
+        return results
+
+
+def reciprocal_rank_fusion(result_lists: list, top_k: int, k: int = 60) -> list:
+    """以 reciprocal rank fusion 合併多組 [(Document, 分數)]，回傳依融合分數排序的前 top_k 筆。"""
+    documents = {}
+    scores = {}
+    for results in result_lists:
+        for rank, (document, _) in enumerate(results, start=1):
+            key = document.id or (document.metadata.get('article_id'), document.metadata.get('chunk_index'))
+            documents.setdefault(key, document)
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [(documents[key], scores[key]) for key in ranked]
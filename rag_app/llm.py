@@ -0,0 +1,23 @@
+import asyncio
+import weakref
+
+from langchain_openai import ChatOpenAI
+
+from env_settings import settings
+
+# 非同步 client 的連線綁定在建立時的 event loop，每個 event loop 各自建立一個
+_async_chat_models = weakref.WeakKeyDictionary()
+
+CHAT_MODEL = "gpt-4o"
+
+
+def create_chat_model() -> ChatOpenAI:
+    return ChatOpenAI(model=CHAT_MODEL, temperature=0, api_key=settings.openai_api_key)
+
+
+def get_async_chat_model() -> ChatOpenAI:
+    """供 ainvoke/astream 使用；ASGI 下整個行程只有一個 event loop，因此只建立一次並重複使用 HTTP keep-alive 連線。"""
+    loop = asyncio.get_running_loop()
+    if loop not in _async_chat_models:
+        _async_chat_models[loop] = create_chat_model()
+    return _async_chat_models[loop]
@@ -0,0 +1,274 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+
+def match_filter(metadata: dict, metadata_filter: dict) -> bool:
+    """支援 Pinecone 形式的 metadata 過濾條件（$eq、$ne、$in、$nin、$gt、$gte、$lt、$lte、$and、$or）。"""
+    for key, condition in metadata_filter.items():
+        if key == '$and':
+            if not all(match_filter(metadata, sub_filter) for sub_filter in condition):
+                return False
+            continue
+        if key == '$or':
+            if not any(match_filter(metadata, sub_filter) for sub_filter in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for operator, operand in condition.items():
+            if operator == '$eq' and value != operand:
+                return False
+            if operator == '$ne' and value == operand:
+                return False
+            if operator == '$in' and value not in operand:
+                return False
+            if operator == '$nin' and value in operand:
+                return False
+            if operator in ('$gt', '$gte', '$lt', '$lte'):
+                if value is None:
+                    return False
+                if operator == '$gt' and not value > operand:
+                    return False
+                if operator == '$gte' and not value >= operand:
+                    return False
+                if operator == '$lt' and not value < operand:
+                    return False
+                if operator == '$lte' and not value <= operand:
+                    return False
+    return True
+
+
+class LocalVectorIndex:
+    """存於本機的向量索引，介面與 Pinecone Index 的 upsert/delete/fetch/query 相同。
+
+    向量以正規化後的 float32 存放在 memory-mapped 檔案（vectors.f32），id 與 metadata 存於 SQLite（meta.sqlite3），
+    多個行程開啟同一目錄時透過 page cache 共用向量資料。相似度為 cosine。
+    """
+
+    def __init__(self, path, dimension: int, nprobe: int = 8):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dimension = dimension
+        self.nprobe = nprobe
+        self._vector_path = self.path / 'vectors.f32'
+        self._ivf_path = self.path / 'ivf.npz'
+        self._vector_path.touch(exist_ok=True)
+        self._local = threading.local()
+        # 查詢執行緒共用目前的 memmap，更換時以 _mm_lock 保護
+        self._mm = None
+        self._mm_key = None
+        self._mm_lock = threading.Lock()
+        self._ivf = None
+        self._ivf_mtime = None
+        with self._write_lock():
+            conn = self._conn()
+            conn.execute('CREATE TABLE IF NOT EXISTS vectors (row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, '
+                         'metadata TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0)')
+            conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path / 'meta.sqlite3', timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write_lock(self):
+        with open(self.path / 'write.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _row_count(self) -> int:
+        row = self._conn().execute('SELECT MAX(row) FROM vectors').fetchone()[0]
+        return 0 if row is None else row + 1
+
+    def _matrix(self, rows: int, writable: bool = False) -> np.ndarray:
+        row_bytes = self.dimension * 4
+        with self._mm_lock:
+            if writable:
+                capacity = os.path.getsize(self._vector_path) // row_bytes
+                if capacity < rows:
+                    # 檔案只會變大，其他行程已映射的範圍仍然有效
+                    os.truncate(self._vector_path, max(rows, capacity * 2, 1024) * row_bytes)
+            stat = os.stat(self._vector_path)
+            capacity = stat.st_size // row_bytes
+            if capacity == 0:
+                return np.zeros((0, self.dimension), dtype=np.float32)
+            # 檔案被取代（inode 改變）或變大時重新映射
+            key = (stat.st_ino, capacity, writable)
+            if self._mm is None or self._mm_key != key:
+                self._mm = np.memmap(self._vector_path, dtype=np.float32, mode='r+' if writable else 'r',
+                                     shape=(capacity, self.dimension))
+                self._mm_key = key
+            return self._mm[:rows]
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def upsert(self, vectors: list, namespace: str = None, **kwargs):
+        vectors = [vector if isinstance(vector, dict) else
+                   {'id': vector[0], 'values': vector[1], 'metadata': vector[2] if len(vector) > 2 else {}}
+                   for vector in vectors]
+        if not vectors:
+            return {'upserted_count': 0}
+        with self._write_lock():
+            conn = self._conn()
+            ids = [vector['id'] for vector in vectors]
+            rows = dict(self._select_rows(conn, ids))
+            next_row = self._row_count()
+            for vector_id in ids:
+                if vector_id not in rows:
+                    rows[vector_id] = next_row
+                    next_row += 1
+            matrix = self._matrix(next_row, writable=True)
+            row_indexes = [rows[vector_id] for vector_id in ids]
+            matrix[row_indexes] = self._normalize([vector['values'] for vector in vectors])
+            matrix.flush()
+            conn.executemany('INSERT OR REPLACE INTO vectors (row, id, metadata, deleted) VALUES (?, ?, ?, 0)', [
+                (rows[vector['id']], vector['id'], json.dumps(vector.get('metadata') or {}, ensure_ascii=False))
+                for vector in vectors
+            ])
+            conn.commit()
+        return {'upserted_count': len(vectors)}
+
+    def _select_rows(self, conn, ids: list):
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            yield from conn.execute(f'SELECT id, row FROM vectors WHERE deleted = 0 AND id IN ({",".join("?" * len(batch))})',
+                                    batch).fetchall()
+
+    def delete(self, ids: list = None, delete_all: bool = None, namespace: str = None, filter: dict = None, **kwargs):
+        with self._write_lock():
+            conn = self._conn()
+            if delete_all:
+                conn.execute('DELETE FROM vectors')
+                conn.commit()
+                # 其他行程可能仍映射著向量檔案，截斷會讓讀取觸發 SIGBUS；改以空檔案取代，舊檔案在映射釋放後才刪除
+                tmp_path = self.path / 'vectors.tmp'
+                tmp_path.write_bytes(b'')
+                os.replace(tmp_path, self._vector_path)
+                self._ivf_path.unlink(missing_ok=True)
+                return {}
+            if filter:
+                ids = [vector_id for vector_id, metadata in
+                       conn.execute('SELECT id, metadata FROM vectors WHERE deleted = 0').fetchall()
+                       if match_filter(json.loads(metadata), filter)]
+            rows = [row for _, row in self._select_rows(conn, list(ids or []))]
+            if rows:
+                matrix = self._matrix(self._row_count(), writable=True)
+                matrix[rows] = 0
+                matrix.flush()
+                conn.executemany('UPDATE vectors SET deleted = 1 WHERE row = ?', [(row,) for row in rows])
+                conn.commit()
+        return {}
+
+    def fetch(self, ids: list, namespace: str = None, **kwargs) -> dict:
+        conn = self._conn()
+        found = {}
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            found.update((vector_id, (row, metadata)) for vector_id, row, metadata in conn.execute(
+                f'SELECT id, row, metadata FROM vectors WHERE deleted = 0 AND id IN ({",".join("?" * len(batch))})',
+                batch).fetchall())
+        matrix = self._matrix(self._row_count())
+        return {'vectors': {vector_id: {'id': vector_id, 'values': matrix[row].tolist(), 'metadata': json.loads(metadata)}
+                            for vector_id, (row, metadata) in found.items()}}
+
+    def _load_ivf(self):
+        if not self._ivf_path.exists():
+            self._ivf = None
+            return None
+        mtime = self._ivf_path.stat().st_mtime
+        if self._ivf is None or self._ivf_mtime != mtime:
+            with np.load(self._ivf_path) as data:
+                self._ivf = {'centroids': data['centroids'], 'assignments': data['assignments'],
+                             'rows': int(data['rows'])}
+            self._ivf_mtime = mtime
+        return self._ivf
+
+    def build_ann_index(self, nlist: int = None, iterations: int = 10, sample_size: int = 50000):
+        """以 k-means 建立 IVF 索引；建立後新增的向量仍以暴力搜尋比對，直到重新建立。"""
+        rows = self._row_count()
+        matrix = np.asarray(self._matrix(rows))
+        if rows == 0:
+            return
+        nlist = nlist or max(1, int(np.sqrt(rows)))
+        rng = np.random.default_rng(0)
+        sample = matrix[rng.choice(rows, size=min(rows, sample_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=min(nlist, len(sample)), replace=False)]
+        for _ in range(iterations):
+            sample_assignments = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(len(centroids)):
+                members = sample[sample_assignments == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+            centroids = self._normalize(centroids)
+        assignments = np.concatenate([np.argmax(matrix[i:i + 10000] @ centroids.T, axis=1)
+                                      for i in range(0, rows, 10000)])
+        tmp_path = self.path / 'ivf.tmp.npz'
+        np.savez(tmp_path, centroids=centroids, assignments=assignments, rows=rows)
+        os.replace(tmp_path, self._ivf_path)
+
+    def _candidate_rows(self, query: np.ndarray, rows: int):
+        ivf = self._load_ivf()
+        if ivf is None:
+            return None
+        probes = np.argsort(ivf['centroids'] @ query)[-self.nprobe:]
+        built_rows = min(ivf['rows'], rows)
+        candidates = np.nonzero(np.isin(ivf['assignments'][:built_rows], probes))[0]
+        return np.concatenate([candidates, np.arange(built_rows, rows)])
+
+    def search(self, vector, top_k: int, filter: dict = None, include_values: bool = False) -> list:
+        """回傳 [(id, score, metadata, values)]，依相似度由高到低排序。"""
+        rows = self._row_count()
+        if rows == 0:
+            return []
+        matrix = self._matrix(rows)
+        query = self._normalize(vector)
+        candidates = self._candidate_rows(query, rows)
+        scores = (matrix if candidates is None else matrix[candidates]) @ query
+        order = np.argsort(-scores)
+        conn = self._conn()
+        results = []
+        batch_size = max(top_k * 4, 32)
+        for i in range(0, len(order), batch_size):
+            batch = order[i:i + batch_size]
+            batch_rows = [int(row) for row in (batch if candidates is None else candidates[batch])]
+            metadata_by_row = {row: (vector_id, metadata) for row, vector_id, metadata in conn.execute(
+                f'SELECT row, id, metadata FROM vectors WHERE deleted = 0 AND row IN ({",".join("?" * len(batch_rows))})',
+                batch_rows).fetchall()}
+            for position, row in zip(batch, batch_rows):
+                if row not in metadata_by_row:
+                    continue
+                vector_id, metadata = metadata_by_row[row]
+                metadata = json.loads(metadata)
+                if filter and not match_filter(metadata, filter):
+                    continue
+                results.append((vector_id, float(scores[position]), metadata,
+                                matrix[row].tolist() if include_values else None))
+                if len(results) >= top_k:
+                    return results
+        return results
+
+    def query(self, vector: list = None, top_k: int = 10, filter: dict = None, include_values: bool = False,
+              include_metadata: bool = True, namespace: str = None, **kwargs) -> dict:
+        return {'matches': [
+            {'id': vector_id, 'score': score, 'metadata': metadata if include_metadata else None, 'values': values}
+            for vector_id, score, metadata, values in self.search(vector, top_k, filter, include_values)
+        ]}
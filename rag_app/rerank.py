@@ -0,0 +1,74 @@
+import numpy as np
+from langchain_core.documents import Document
+
+
+def query_candidates(index, embedding: list, k: int, filter: dict = None, include_values: bool = False,
+                     text_key: str = 'text') -> tuple:
+    """以 index.query 取得候選段落，回傳 ([(Document, 分數)], 向量矩陣或 None)。"""
+    response = index.query(vector=embedding, top_k=k, filter=filter, include_values=include_values,
+                           include_metadata=True)
+    results = []
+    vectors = []
+    for match in response['matches']:
+        metadata = dict(match['metadata'] or {})
+        text = metadata.pop(text_key, '')
+        results.append((Document(id=match['id'], page_content=text, metadata=metadata), match['score']))
+        if include_values:
+            vectors.append(match['values'])
+    if not include_values:
+        return results, None
+    return results, np.asarray(vectors, dtype=np.float32).reshape(len(results), -1)
+
+
+def mmr_rerank(query_embedding: list, results: list, vectors: np.ndarray, k: int, lambda_mult: float = 0.5,
+               max_per_article: int = None, duplicate_threshold: float = None) -> list:
+    """以 Maximal Marginal Relevance 依序挑選 k 個段落。
+
+    每一步選出 lambda_mult * 與問題的相似度 - (1 - lambda_mult) * 與已選段落的最大相似度 最高的段落；
+    與已選段落相似度達 duplicate_threshold 的段落（重疊或轉貼的內容）與超過 max_per_article 的文章不再選入。
+    回傳的分數沿用原本的相似度。
+    """
+    if not results:
+        return []
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1)
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+    article_ids = np.array([int(document.metadata.get('article_id', -1)) for document, _ in results])
+
+    available = np.ones(len(results), dtype=bool)
+    max_similarity = np.full(len(results), -np.inf, dtype=np.float32)
+    article_counts = {}
+    selected = []
+    while len(selected) < k and available.any():
+        redundancy = np.where(np.isfinite(max_similarity), max_similarity, 0)
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+        if duplicate_threshold is not None:
+            available &= similarity[best] < duplicate_threshold
+        article_counts[article_ids[best]] = article_counts.get(article_ids[best], 0) + 1
+        if max_per_article and article_counts[article_ids[best]] >= max_per_article:
+            available &= article_ids != article_ids[best]
+    return [results[i] for i in selected]
+
+
+def limit_per_article(results: list, k: int, max_per_article: int = None) -> list:
+    """依序保留前 k 個段落，每篇文章最多 max_per_article 個。"""
+    if not max_per_article:
+        return results[:k]
+    article_counts = {}
+    limited = []
+    for document, score in results:
+        article_id = int(document.metadata.get('article_id', -1))
+        if article_counts.get(article_id, 0) >= max_per_article:
+            continue
+        article_counts[article_id] = article_counts.get(article_id, 0) + 1
+        limited.append((document, score))
+        if len(limited) >= k:
+            break
+    return limited
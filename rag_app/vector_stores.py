@@ -0,0 +1,145 @@
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from pinecone import Pinecone
+
+from article_app.models import VectorIndexAlias
+from env_settings import settings
+from rag_app.lexical import LexicalIndex
+from rag_app.local_store import LocalVectorIndex
+
+
+# 每個行程只建立一次 Pinecone Index，重複使用其連線池
+_pinecone_indexes = {}
+_pinecone_indexes_lock = threading.Lock()
+
+
+@lru_cache
+def get_pinecone() -> Pinecone:
+    return Pinecone(api_key=settings.pinecone_api_key)
+
+
+def get_pinecone_index(index_name: str):
+    with _pinecone_indexes_lock:
+        if index_name not in _pinecone_indexes:
+            _pinecone_indexes[index_name] = get_pinecone().Index(
+                index_name, connection_pool_maxsize=settings.vector_pool_maxsize)
+        return _pinecone_indexes[index_name]
+
+
+def get_connection_stats() -> dict:
+    """回傳 {索引名稱: {'connections': 已建立連線數, 'requests': 請求數}}。"""
+    stats = {}
+    for index_name, index in list(_pinecone_indexes.items()):
+        pool_manager = getattr(getattr(index._api_client, 'rest_client', None), 'pool_manager', None)
+        pools = [pool_manager.pools[key] for key in pool_manager.pools.keys()] if pool_manager else []
+        stats[index_name] = {
+            'connections': sum(pool.num_connections for pool in pools),
+            'requests': sum(pool.num_requests for pool in pools),
+        }
+    return stats
+
+
+class NamespacedIndex:
+    """固定寫入與查詢同一個 namespace 的 Pinecone Index。"""
+
+    def __init__(self, index, namespace: str):
+        self.index = index
+        self.namespace = namespace
+
+    def upsert(self, vectors: list, **kwargs):
+        return self.index.upsert(vectors=vectors, namespace=self.namespace, **kwargs)
+
+    def delete(self, ids: list = None, **kwargs):
+        return self.index.delete(ids=ids, namespace=self.namespace, **kwargs)
+
+    def fetch(self, ids: list, **kwargs):
+        return self.index.fetch(ids=ids, namespace=self.namespace, **kwargs)
+
+    def query(self, **kwargs):
+        return self.index.query(namespace=self.namespace, **kwargs)
+
+
+@lru_cache
+def get_local_index(index_name: str, namespace: str = '') -> LocalVectorIndex:
+    # 本機索引的每個 namespace 為獨立目錄
+    directory = f'{index_name}.{namespace}' if namespace else index_name
+    return LocalVectorIndex(Path(settings.local_index_dir) / directory, settings.embedding_dimension,
+                            nprobe=settings.local_index_nprobe)
+
+
+@lru_cache
+def get_lexical_index(index_name: str, namespace: str = '') -> LexicalIndex:
+    filename = f'{index_name}.{namespace}.sqlite3' if namespace else f'{index_name}.sqlite3'
+    return LexicalIndex(Path(settings.lexical_index_dir) / filename)
+
+
+class LexicalMirroredIndex:
+    """寫入與刪除向量時一併更新關鍵字索引，fetch 與 query 只查詢向量索引。"""
+
+    def __init__(self, index, lexical_index: LexicalIndex):
+        self.index = index
+        self.lexical_index = lexical_index
+
+    def upsert(self, vectors: list, **kwargs):
+        response = self.index.upsert(vectors, **kwargs)
+        self.lexical_index.upsert(vectors)
+        return response
+
+    def delete(self, ids: list = None, **kwargs):
+        response = self.index.delete(ids=ids, **kwargs)
+        self.lexical_index.delete(ids=ids, delete_all=kwargs.get('delete_all'))
+        return response
+
+    def fetch(self, ids: list, **kwargs):
+        return self.index.fetch(ids=ids, **kwargs)
+
+    def query(self, **kwargs):
+        return self.index.query(**kwargs)
+
+
+def get_vector_id(article_id: int, index_name: str, chunk_index: int) -> str:
+    return f'{article_id}-{index_name}-{chunk_index}'
+
+
+def get_state_name(index_name: str, namespace: str = '') -> str:
+    # 索引狀態依 namespace 分開記錄，重建中的 namespace 不影響使用中的狀態
+    return f'{index_name}@{namespace}' if namespace else index_name
+
+
+def get_index(index_name: str, namespace: str = ''):
+    """依 settings.vector_backend 回傳 Pinecone Index 或本機索引，兩者皆提供 upsert/delete/fetch/query。"""
+    if settings.vector_backend == 'local':
+        index = get_local_index(index_name, namespace)
+    else:
+        index = get_pinecone_index(index_name)
+        index = NamespacedIndex(index, namespace) if namespace else index
+    if settings.lexical_search and index_name == settings.search_index_name:
+        return LexicalMirroredIndex(index, get_lexical_index(index_name, namespace))
+    return index
+
+
+def get_active_namespaces(index_names) -> dict:
+    """回傳 {索引名稱: 目前使用中的 namespace}。"""
+    namespaces = dict(VectorIndexAlias.objects.filter(index_name__in=index_names).values_list('index_name', 'namespace'))
+    return {index_name: namespaces.get(index_name, '') for index_name in index_names}
+
+
+async def aget_active_namespace(index_name: str) -> str:
+    """在 event loop 上查詢索引目前使用中的 namespace，執行緒池中的查詢只連線向量與關鍵字索引。"""
+    namespace = await (VectorIndexAlias.objects.filter(index_name=index_name)
+                       .values_list('namespace', flat=True).afirst())
+    return namespace or ''
+
+
+def lexical_search(index_name: str, namespace: str, query: str, k: int, filter: dict = None) -> list:
+    """在 namespace 對應的關鍵字索引查詢，回傳 [(Document, 分數)]。"""
+    return get_lexical_index(index_name, namespace).search(query, k, filter)
+
+
+def fetch_metadata(index, ids: list) -> dict:
+    """回傳 {向量 id: metadata}；Pinecone 回傳 FetchResponse，本機索引回傳 dict。"""
+    response = index.fetch(ids=ids)
+    vectors = response['vectors'] if isinstance(response, dict) else response.vectors
+    return {vector_id: vector['metadata'] or {} for vector_id, vector in vectors.items()}